@@ -17,13 +17,15 @@ plex_log = logging.getLogger("Plex")
 bot_log = logging.getLogger("Bot")
 
 
-def load_config(basedir: str,filename: str) -> Dict[str, str]:
+def load_config(basedir: str,filename: str, cachedir: str = None) -> Dict[str, str]:
     """Loads config from yaml file
 
     Grabs key/value config pairs from a file.
 
     Args:
+        basedir: str config dir.
         filename: str path to yaml file.
+        cachedir: str default cache dir, basedir/cache if None.
 
     Returns:
         Dict[str, str] Values from config file.
@@ -57,4 +59,10 @@ def load_config(basedir: str,filename: str) -> Dict[str, str]:
     if config["lyrics"] and config["lyrics"]["token"].lower() == "none":
         config["lyrics"] = None
 
+    # Relative cache dirs are under the config dir
+    if config["plex"].get("cache_dir"):
+        config["plex"]["cache_dir"] = Path(basedir, config["plex"]["cache_dir"])
+    else:
+        config["plex"]["cache_dir"] = Path(cachedir or Path(basedir, "cache"))
+
     return config
@@ -4,18 +4,17 @@ Sets up loggers and initiates bot.
 """
 import logging
 
-from discord.ext.commands import Bot
-
 from . import load_config
-from .bot import General
-from .bot import Plex
 
 # Load config from file
 configdir = "config"
+cachedir = None
 from os import geteuid
 if geteuid() == 0:
     configdir = "/config"
-config = load_config(configdir,"config.yaml")
+    # /config is mounted read-only in docker
+    cachedir = "/cache"
+config = load_config(configdir,"config.yaml",cachedir)
 
 BOT_PREFIX = config["discord"]["prefix"]
 TOKEN = config["discord"]["token"]
@@ -23,11 +22,31 @@ TOKEN = config["discord"]["token"]
 BASE_URL = config["plex"]["base_url"]
 PLEX_TOKEN = config["plex"]["token"]
 LIBRARY_NAME = config["plex"]["library_name"]
+PLEX_WORKERS = config["plex"].get("workers", 4)
+PLEX_TIMEOUT = config["plex"].get("timeout", 10)
+PLEX_POOL_SIZE = config["plex"].get("pool_size", PLEX_WORKERS)
+PLEX_RETRIES = config["plex"].get("retries", 2)
+PLEX_INDEX = config["plex"].get("index", False)
+PLEX_INDEX_REFRESH = config["plex"].get("index_refresh", 300)
+CACHE_DIR = config["plex"]["cache_dir"]
+THUMB_CACHE_MB = config["plex"].get("thumb_cache_mb", 32)
+THUMB_DISK_CACHE_MB = config["plex"].get("thumb_disk_cache_mb", 0)
+THUMB_SIZE = config["plex"].get("thumb_size", 160)
+AUDIO_MODE = config["plex"].get("audio_mode", "opus")
+BITRATE = config["plex"].get("bitrate", 128)
+PREFETCH_LEAD = config["plex"].get("prefetch_lead", 10)
+
+METRICS = config.get("metrics") or {}
+METRICS_HOST = METRICS.get("host", "127.0.0.1")
+METRICS_PORT = METRICS.get("port", 0)
+STALL_THRESHOLD = METRICS.get("stall_ms", 250) / 1000
 
 if config["lyrics"]:
     LYRICS_TOKEN = config["lyrics"]["token"]
+    LYRICS_TTL = config["lyrics"].get("ttl_days", 30)
 else:
     LYRICS_TOKEN = None
+    LYRICS_TTL = 30
     
 # Set appropiate log level
 root_log = logging.getLogger()
@@ -41,12 +60,36 @@ plex_args = {
     "base_url": BASE_URL,
     "plex_token": PLEX_TOKEN,
     "lib_name": LIBRARY_NAME,
+    "workers": PLEX_WORKERS,
+    "timeout": PLEX_TIMEOUT,
+    "pool_size": PLEX_POOL_SIZE,
+    "retries": PLEX_RETRIES,
+    "index": PLEX_INDEX,
+    "index_refresh": PLEX_INDEX_REFRESH,
+    "cache_dir": CACHE_DIR,
+    "thumb_cache_mb": THUMB_CACHE_MB,
+    "thumb_disk_cache_mb": THUMB_DISK_CACHE_MB,
+    "thumb_size": THUMB_SIZE,
+    "audio_mode": AUDIO_MODE,
+    "bitrate": BITRATE,
+    "prefetch_lead": PREFETCH_LEAD,
     "lyrics_token": LYRICS_TOKEN,
+    "lyrics_ttl": LYRICS_TTL,
+    "stall_threshold": STALL_THRESHOLD,
 }
 
+# Heavy imports only once the config is known to be valid
+from discord.ext.commands import Bot
+
+from . import metrics
+from .bot import General
+from .bot import Plex
+
 bot = Bot(command_prefix=BOT_PREFIX)
 # Remove help command, we have our own custom one.
 bot.remove_command("help")
 bot.add_cog(General(bot))
 bot.add_cog(Plex(bot, **plex_args))
+if METRICS_PORT:
+    bot.loop.create_task(metrics.start_server(METRICS_HOST, METRICS_PORT))
 bot.run(TOKEN)
@@ -2,20 +2,41 @@
 import asyncio
 import io
 import logging
-from urllib.request import urlopen
+import sqlite3
+import threading
+import time
+import uuid
+from urllib.parse import urlencode
+
 import requests
 
 import discord
-from async_timeout import timeout
+from discord import FFmpegOpusAudio
 from discord import FFmpegPCMAudio
 from discord.ext import commands
 from discord.ext.commands import command
 from plexapi.exceptions import Unauthorized
+from plexapi import X_PLEX_IDENTIFIER
+from plexapi.exceptions import BadRequest
 from plexapi.exceptions import NotFound
-from plexapi.server import PlexServer
 
+from . import metrics
 from .exceptions import MediaNotFoundError
+from .exceptions import PlexTimeoutError
+from .exceptions import PlexUnavailableError
 from .exceptions import VoiceChannelError
+from .gateway import PlexGateway
+from .index import fetch_page
+from .index import IndexSnapshot
+from .index import LibraryIndex
+from .metadata import MetadataResolver
+from .outbox import Outbox
+from .player import GuildPlayer
+from .player import PLAYING
+from .playqueue import QueueEntry
+from .playqueue import ShuffleSpan
+from .session import build_session
+from .watchdog import LoopWatchdog
 
 root_log = logging.getLogger()
 plex_log = logging.getLogger("Plex")
@@ -26,15 +47,17 @@ General:
     kill [silent] - Halt the bot [silently].
     help - Print this help message.
     cleanup - Delete old messages from the bot.
+    stats - Print latency and cache metrics (Bot owner only).
+    profile [SECONDS] [stacks] - Profile the bot, [attach flamegraph stacks] (Bot owner only).
 
 Plex:
     play <SONG_NAME> - Play a song from the plex server.
     album <ALBUM_NAME> - Queue an entire album to play.
     playlist <PLAYLIST_NAME> - Queue an entire playlist to play.
     show_playlists <ARG> <ARG> - Query for playlists with a name matching any of the arguments.
-    lyrics - Print the lyrics of the song (Requires Genius API)
+    lyrics - Print the lyrics of the song (From Plex or the Genius API)
     np - Print the current playing song.
-    q - Print the current queue (This can take very long!)
+    q [PAGE] - Print the current queue, react to page through it.
     stop - Halt playback and leave vc.
     loop - Loop the current song.
     loopq - Loop the current queue.
@@ -44,11 +67,45 @@ Plex:
     resume - Resume playback.
     skip - Skip the current song. Give a number as argument to skip more than 1.
     clear - Clear play queue.
+    remove <N> - Remove the song at position N from the queue.
+    move <FROM> <TO> - Move a song to another position in the queue.
+    shuffle - Shuffle the play queue.
 
 [] - Optional args.
 """
 
 
+def format_duration(millis: int) -> str:
+    """
+    Format a duration as HH:MM:SS
+
+    Args:
+        millis: int duration in milliseconds
+
+    Returns:
+        str formatted duration
+    """
+    minutes, seconds = divmod(int(millis) // 1000, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02}:{minutes:02}:{seconds:02}"
+
+
+def plex_available():
+    """
+    Command check failing fast while Plex is unreachable
+
+    Returns:
+        Decorator adding the check to a command
+    """
+
+    async def predicate(ctx):
+        if not ctx.cog.available:
+            raise PlexUnavailableError("Plex is unavailable")
+        return True
+
+    return commands.check(predicate)
+
+
 class General(commands.Cog):
     """
     General commands
@@ -56,6 +113,15 @@ class General(commands.Cog):
     Manage general bot behavior
     """
 
+    # Discord only bulk deletes messages younger than 14 days,
+    # keep a minute of slack for the request to get there
+    BULK_DELETE_AGE = 14 * 86400 - 60
+    BULK_DELETE_SIZE = 100
+    # Concurrent single deletes of older messages
+    DELETE_CONCURRENCY = 4
+    # Longest profiling window in seconds
+    MAX_PROFILE = 300
+
     def __init__(self, bot):
         """
         Initialize commands
@@ -70,6 +136,15 @@ class General(commands.Cog):
             None
         """
         self.bot = bot
+        self.profiling = False
+
+    async def cog_before_invoke(self, ctx):
+        """Start timing a command of this cog."""
+        metrics.command_started(ctx)
+
+    async def cog_after_invoke(self, ctx):
+        """Record latency and outcome of a command of this cog."""
+        metrics.command_finished(ctx)
 
     @command()
     async def kill(self, ctx, *args):
@@ -125,28 +200,173 @@ class General(commands.Cog):
             None
         """
         channel = ctx.message.channel
+        start = time.monotonic()
+        cutoff = (time.time() - self.BULK_DELETE_AGE) * 1000
 
+        # Single pass collecting own messages and commands of the author
+        recent, old = [], []
         try:
             async for i in channel.history(limit=limit):
-                # Only delete messages sent by self
-                if i.author == self.bot.user:
-                    try:
-                        await i.delete()
-                    except (discord.Forbidden, discord.NotFound, discord.HTTPException):
-                        pass
-
-            async for i in channel.history(limit=limit):
-                if i.author == ctx.message.author and i.content.startswith(
-                    self.bot.command_prefix
+                if i.author == self.bot.user or (
+                    i.author == ctx.message.author
+                    and i.content.startswith(self.bot.command_prefix)
                 ):
-                    try:
-                        await i.delete()
-                    except (discord.Forbidden, discord.NotFound, discord.HTTPException):
-                        pass
-
+                    # Snowflakes carry their creation time in ms
+                    created = (i.id >> 22) + discord.utils.DISCORD_EPOCH
+                    (recent if created > cutoff else old).append(i)
         except discord.Forbidden:
             bot_log.info("Unable to delete messages, insufficient permissions.")
             await ctx.send("I don't have the necessary permissions to delete messages.")
+            return
+
+        deleted = 0
+        if hasattr(channel, "delete_messages"):
+            for pos in range(0, len(recent), self.BULK_DELETE_SIZE):
+                chunk = recent[pos : pos + self.BULK_DELETE_SIZE]
+                try:
+                    await channel.delete_messages(chunk)
+                    deleted += len(chunk)
+                except discord.Forbidden:
+                    # Bulk delete needs manage messages, fall back below
+                    old.extend(recent[pos:])
+                    break
+                except discord.HTTPException as err:
+                    bot_log.debug("Bulk delete failed - %s", err)
+                    old.extend(chunk)
+        else:
+            old.extend(recent)
+
+        deleted += await self._delete_each(old)
+        elapsed = time.monotonic() - start
+        bot_log.debug("Cleanup removed %s messages in %.1fs", deleted, elapsed)
+        await ctx.send(
+            f":broom: Removed {deleted} messages in {elapsed:.1f}s.", delete_after=10
+        )
+
+    @command()
+    @commands.is_owner()
+    async def stats(self, ctx):
+        """
+        Admin command printing bot metrics
+
+        Summarizes command and Plex call latency, and the
+        figures of the Plex gateway and caches. The full
+        set is served by the metrics endpoint if enabled.
+
+        Args:
+            ctx: discord.ext.commands.Context message context from command
+
+        Returns:
+            None
+
+        Raises:
+            None
+        """
+        lines = ["Commands:         count    avg ms  errors"]
+        for labels in sorted(metrics.COMMAND_SECONDS.keys(), key=lambda x: x["command"]):
+            name = labels["command"]
+            count, mean = metrics.COMMAND_SECONDS.summary(command=name)
+            errors = metrics.COMMANDS.get(command=name, status="error")
+            lines.append(f"  {name:<16}{count:>6}{mean * 1000:>10.1f}{errors:>8.0f}")
+
+        lines.append("Plex calls:       count    avg ms")
+        for labels in sorted(metrics.PLEX_SECONDS.keys(), key=lambda x: x["call"]):
+            count, mean = metrics.PLEX_SECONDS.summary(**labels)
+            lines.append(f"  {labels['call']:<16}{count:>6}{mean * 1000:>10.1f}")
+
+        for name, histogram in (
+            ("Art fetch", metrics.ART_SECONDS),
+            ("Audio source", metrics.SOURCE_SECONDS),
+            ("Loop lag", metrics.LOOP_LAG),
+        ):
+            count, mean = histogram.summary()
+            lines.append(f"{name + ':':<18}{count:>6}{mean * 1000:>10.1f}")
+
+        stalls = [
+            (labels[0], value)
+            for _, labels, _, value in metrics.LOOP_STALLS.samples()
+        ]
+        if stalls:
+            lines.append("Loop stalls:      count")
+            for name, count in sorted(stalls, key=lambda x: -x[1]):
+                lines.append(f"  {name[:16]:<16}{count:>6.0f}")
+
+        lines.append("Gauges:")
+        for collector in metrics.REGISTRY.collectors:
+            for key, value in collector().items():
+                lines.append(f"  {key[len('plexbot_'):]:<32}{value:>10.6g}")
+
+        await ctx.send("```" + "\n".join(lines)[:1990] + "```")
+
+    @command()
+    @commands.is_owner()
+    async def profile(self, ctx, seconds: int = 10, *args):
+        """
+        Admin command profiling the running bot
+
+        Samples every thread for a while and reports the hottest
+        functions of the event loop, and every time the loop was
+        blocked along with what blocked it.
+
+        Args:
+            ctx: discord.ext.commands.Context message context from command
+            seconds: int length of the profiling window
+            *args: `stacks` to attach a collapsed stack file for flamegraphs
+
+        Returns:
+            None
+
+        Raises:
+            None
+        """
+        from .profiler import SamplingProfiler
+
+        if self.profiling:
+            await ctx.send("Already profiling.")
+            return
+        seconds = max(1, min(seconds, self.MAX_PROFILE))
+        await ctx.send(f":stopwatch: Profiling for {seconds}s...")
+
+        profiler = SamplingProfiler(self.bot.loop)
+        self.profiling = True
+        try:
+            await profiler.run(seconds)
+        finally:
+            self.profiling = False
+        bot_log.info("Profiled %ss, %s samples", seconds, profiler.samples)
+
+        report = profiler.report()
+        for pos in range(0, len(report), 1950):
+            await ctx.send(f"```{report[pos : pos + 1950]}```")
+        if "stacks" in args:
+            stacks = io.BytesIO(profiler.collapsed().encode())
+            await ctx.send(file=discord.File(stacks, filename="profile.collapsed"))
+
+    async def _delete_each(self, messages):
+        """
+        Delete messages one by one, a few at a time
+
+        discord.py waits out rate limits per route on its own,
+        this only bounds how many deletes are in flight.
+
+        Args:
+            messages: list of discord.Message to delete
+
+        Returns:
+            int number of messages deleted
+        """
+        sem = asyncio.Semaphore(self.DELETE_CONCURRENCY)
+
+        async def delete(msg):
+            async with sem:
+                try:
+                    await msg.delete()
+                    return True
+                except (discord.Forbidden, discord.NotFound, discord.HTTPException):
+                    return False
+
+        results = await asyncio.gather(*(delete(msg) for msg in messages))
+        return sum(results)
 
 
 class Plex(commands.Cog):
@@ -161,21 +381,50 @@ class Plex(commands.Cog):
     # All are necessary to detect global interactions
     # within the bot.
 
+    # Tracks requested per page when queueing albums and playlists
+    PAGE_SIZE = 100
+
+    # Queue view paging
+    QUEUE_PAGE_SIZE = 10
+    QUEUE_VIEW_TIMEOUT = 120
+    PREV_PAGE = "\u25c0\ufe0f"
+    NEXT_PAGE = "\u25b6\ufe0f"
+
+    # Plex reconnect backoff and health check interval, in seconds
+    RECONNECT_MIN = 1
+    RECONNECT_MAX = 300
+    HEALTH_INTERVAL = 60
+
     def __init__(self, bot, **kwargs):
         """
         Initializes Plex resources
 
-        Connects to Plex library and sets up
-        all asyncronous communications.
+        Sets up all asyncronous communications. The Plex
+        connection itself is made in the background, so
+        the bot comes online no matter how Plex is doing.
 
         Args:
             bot: discord.ext.command.Bot, bind for cogs
             base_url: str url to Plex server
             plex_token: str X-Token of Plex server
             lib_name: str name of Plex library to search through
+            workers: int max concurrent Plex requests
+            timeout: float seconds before a Plex request is abandoned
+            pool_size: int HTTP connections kept open to Plex
+            retries: int HTTP retries on connection and gateway errors
+            index: bool keep an in-memory search index of the library
+            index_refresh: int seconds between incremental index syncs
+            cache_dir: pathlib.Path directory for persistent caches
+            thumb_cache_mb: int memory budget of the thumbnail cache
+            thumb_disk_cache_mb: int disk budget of the thumbnail cache, 0 disables it
+            thumb_size: int edge in px art is downscaled to by Plex, 0 for originals
+            audio_mode: str pcm, opus or transcode, see _audio_source
+            bitrate: int kbps of Opus audio encoded by FFmpeg or Plex
+            prefetch_lead: int seconds before a track ends to start the next stream, 0 disables it
+            lyrics_ttl: int days looked up lyrics are cached for
 
         Raises:
-            plexapi.exceptions.Unauthorized: Invalid Plex token
+            None
 
         Returns:
             None
@@ -186,63 +435,503 @@ class Plex(commands.Cog):
         self.plex_token = kwargs["plex_token"]
         self.library_name = kwargs["lib_name"]
         self.bot_prefix = bot.command_prefix
+        self.audio_mode = kwargs.get("audio_mode", "opus")
+        self.bitrate = kwargs.get("bitrate", 128)
+        self.prefetch_lead = kwargs.get("prefetch_lead", 10)
+
+        # All blocking Plex requests go through the gateway
+        workers = kwargs.get("workers", 4)
+        self.timeout = kwargs.get("timeout", 10)
+        self.gateway = PlexGateway(max_workers=workers, timeout=self.timeout)
+        self.session = build_session(
+            pool_size=kwargs.get("pool_size", workers), retries=kwargs.get("retries", 2)
+        )
 
-        if kwargs["lyrics_token"]:
-            import lyricsgenius
-            self.genius = lyricsgenius.Genius(kwargs["lyrics_token"])
+        # Optional subsystems are only loaded once first used,
+        # keeping their imports off the startup path
+        self._lazy_lock = threading.Lock()
+        self.lyrics_token = kwargs["lyrics_token"]
+        self.genius = None
+        if not self.lyrics_token:
+            plex_log.warning("No lyrics token specified, only Plex lyrics available")
+
+        # Filled in by _plex_task once Plex answers
+        self.pms = None
+        self.music = None
+        self.resolver = None
+        self.available = False
+        self.connected = asyncio.Event()
+        self.bot.loop.create_task(self._plex_task())
+
+        self.cache_dir = kwargs.get("cache_dir")
+
+        # Shared art cache for all embed cards
+        self.thumb_size = kwargs.get("thumb_size", 160)
+        self.thumb_cache_mb = kwargs.get("thumb_cache_mb", 32)
+        self.thumb_disk_cache_mb = kwargs.get("thumb_disk_cache_mb", 0)
+        self._thumbs = None
+
+        # Lyrics by ratingKey, with lookups in flight shared by all callers
+        self.lyrics_ttl = kwargs.get("lyrics_ttl", 30)
+        self._lyrics_cache = None
+        self._lyrics_tasks = {}
+
+        # Optional local search index, filled and refreshed in the background
+        self.index_refresh = kwargs.get("index_refresh", 300)
+        self.index_watermark = 0
+        if kwargs.get("index"):
+            self.index = LibraryIndex()
+            if self.cache_dir:
+                self.snapshot = IndexSnapshot(self.cache_dir / "index.sqlite")
+            else:
+                self.snapshot = None
+            self.bot.loop.create_task(self._index_task())
         else:
-            plex_log.warning("No lyrics token specified, lyrics disabled")
-            self.genius = None
+            self.index = None
 
-        # Log fatal invalid plex token
-        try:
-            self.pms = PlexServer(self.base_url, self.plex_token)
-        except Unauthorized:
-            plex_log.fatal("Invalid Plex token, stopping...")
-            raise Unauthorized("Invalid Plex token")
-
-        self.music = self.pms.library.section(self.library_name)
-        plex_log.debug("Connected to plex library: %s", self.library_name)
-
-        # Initialize necessary vars
-        self.voice_channel = None
-        self.current_track = None
-        self.is_looping = False
-        self.loop_queue = None
-        self.np_message_id = None
-        self.show_queue_message_ids = []
-        self.ctx = None
-
-        # Initialize events
-        self.play_queue = asyncio.Queue()
-        self.play_next_event = asyncio.Event()
+        # Playback state of every active guild
+        self.players = {}
+
+        # Paced, coalesced sends for bursty replies
+        self.outbox = Outbox()
+
+        # Started with the first player, stalls are when audio suffers.
+        # Stalls this long starve the voice thread of Opus frames.
+        self.watchdog = LoopWatchdog(
+            self.bot.loop,
+            threshold=kwargs.get("stall_threshold", 0.25),
+            on_stall=self._on_loop_stall,
+        )
+
+        metrics.REGISTRY.add_collector(self._collect_metrics)
 
         bot_log.info("Started bot successfully")
-        self.bot.loop.create_task(self._audio_player_task())
 
-    def _search_tracks(self, title: str):
+    @property
+    def thumbs(self):
+        """
+        Thumbnail cache, created on first use
+
+        Returns:
+            PlexBot.thumbs.ThumbnailCache
+        """
+        with self._lazy_lock:
+            if self._thumbs is None:
+                from .thumbs import ThumbnailCache
+
+                disk_mb = self.thumb_disk_cache_mb
+                self._thumbs = ThumbnailCache(
+                    self.thumb_cache_mb * 2 ** 20,
+                    disk_dir=self.cache_dir / "thumbs"
+                    if self.cache_dir and disk_mb
+                    else None,
+                    disk_max_bytes=disk_mb * 2 ** 20,
+                )
+            return self._thumbs
+
+    @property
+    def lyrics_cache(self):
+        """
+        Lyrics cache, created on first use
+
+        Returns:
+            PlexBot.lyrics.LyricsCache
+        """
+        with self._lazy_lock:
+            if self._lyrics_cache is None:
+                from .lyrics import LyricsCache
+
+                self._lyrics_cache = LyricsCache(
+                    self.cache_dir / "lyrics.sqlite" if self.cache_dir else None,
+                    ttl=self.lyrics_ttl * 86400,
+                )
+            return self._lyrics_cache
+
+    def _genius_client(self):
+        """
+        Genius API client, created on first use
+
+        lyricsgenius pulls in a whole HTML parser, so it is
+        only imported once lyrics are actually searched for.
+        Blocking, meant to be run in an executor.
+
+        Returns:
+            lyricsgenius.Genius, None if lyrics are disabled
+        """
+        with self._lazy_lock:
+            if self.genius is None and self.lyrics_token:
+                import lyricsgenius
+
+                self.genius = lyricsgenius.Genius(self.lyrics_token)
+            return self.genius
+
+    def _connect(self):
+        """
+        Connect to the Plex server and music library
+
+        Blocking, meant to be run through the PlexGateway.
+
+        Returns:
+            None
+
+        Raises:
+            plexapi.exceptions.Unauthorized: Invalid Plex token
+            plexapi.exceptions.NotFound: Library doesn't exist
+            requests.RequestException: Plex is unreachable
+        """
+        # Imports the whole plexapi object model, keep it off the loop
+        from plexapi.server import PlexServer
+
+        pms = PlexServer(
+            self.base_url, self.plex_token, session=self.session, timeout=self.timeout
+        )
+        self.music = pms.library.section(self.library_name)
+        self.pms = pms
+        # Item lookups by ratingKey, batched across concurrent callers
+        self.resolver = MetadataResolver(self.pms, self.gateway)
+
+    async def _plex_task(self):
+        """
+        Coroutine connecting to Plex and watching its health
+
+        Retries with exponential backoff until Plex answers, then
+        checks on it periodically. Commands needing Plex fail fast
+        whenever it is unavailable.
+
+        Returns:
+            None
+
+        Raises:
+            None
+        """
+        delay = self.RECONNECT_MIN
+        while True:
+            try:
+                if self.pms is None:
+                    await self.gateway.run(self._connect)
+                else:
+                    await self.gateway.run(self.pms.query, "/identity")
+            except Unauthorized:
+                # Log fatal invalid plex token, no point in retrying
+                plex_log.fatal("Invalid Plex token, Plex commands disabled")
+                self.available = False
+                return
+            except (
+                PlexTimeoutError,
+                NotFound,
+                BadRequest,
+                requests.RequestException,
+            ) as err:
+                if self.available:
+                    plex_log.warning("Lost connection to Plex: %s", err)
+                plex_log.info("Plex unavailable (%s), retrying in %ss", err, delay)
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pylint: disable=broad-except
+                # Like a proxy error page failing to parse, never give up on Plex
+                plex_log.error(
+                    "Unexpected error reaching Plex, retrying in %ss", delay, exc_info=True
+                )
+            else:
+                if not self.available:
+                    plex_log.info("Connected to plex library: %s", self.library_name)
+                self.available = True
+                self.connected.set()
+                delay = self.RECONNECT_MIN
+                await asyncio.sleep(self.HEALTH_INTERVAL)
+                continue
+
+            self.available = False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.RECONNECT_MAX)
+
+    def _on_loop_stall(self, lag: float, command: str):
+        """
+        Warn when a loop stall happened during playback
+
+        Args:
+            lag: float seconds the loop was stalled
+            command: str command or task blamed for it
+
+        Returns:
+            None
+        """
+        playing = [p for p in self.players.values() if p.state == PLAYING]
+        if playing:
+            bot_log.warning(
+                "Loop stalled %.0fms in %s while %d guild(s) played, "
+                "expect audio underruns",
+                lag * 1000,
+                command,
+                len(playing),
+            )
+
+    def _collect_metrics(self):
+        """
+        Figures kept by the gateway, caches and players
+
+        Returns:
+            Dict of gauge name to value
+        """
+        values = {f"plexbot_gateway_{k}": v for k, v in self.gateway.stats().items()}
+        if self._thumbs:
+            for key, value in self._thumbs.stats().items():
+                values[f"plexbot_thumbs_{key}"] = value
+        if self.resolver:
+            for key, value in self.resolver.stats().items():
+                values[f"plexbot_resolver_{key}"] = value
+        values["plexbot_plex_available"] = int(self.available)
+        values["plexbot_players"] = len(self.players)
+        values["plexbot_queued_tracks"] = sum(
+            len(player.play_queue) for player in self.players.values()
+        )
+        if self.index:
+            values["plexbot_index_entries"] = len(self.index)
+        for key, value in self.outbox.stats().items():
+            values[f"plexbot_outbox_{key}"] = value
+        values["plexbot_loop_max_lag_seconds"] = self.watchdog.max_lag
+        return values
+
+    async def cog_before_invoke(self, ctx):
+        """Start timing a command of this cog."""
+        metrics.command_started(ctx)
+
+    async def cog_after_invoke(self, ctx):
+        """Record latency and outcome of a command of this cog."""
+        metrics.command_finished(ctx)
+
+    async def cog_command_error(self, ctx, error):
+        """
+        Error handler of all Plex commands
+
+        Args:
+            ctx: discord.ext.commands.Context message context from command
+            error: discord.ext.commands.CommandError raised
+
+        Returns:
+            None
+        """
+        if isinstance(error, PlexUnavailableError):
+            await ctx.send("Plex is unavailable right now, try again in a bit.")
+            return
+        if isinstance(getattr(error, "original", error), PlexTimeoutError):
+            await ctx.send("Plex is taking too long to respond, try again later.")
+            return
+        bot_log.error(
+            "Error in command %s",
+            ctx.command,
+            exc_info=(type(error), error, error.__traceback__),
+        )
+
+    async def _sync_index(self, since: int = None, page_size: int = 1000):
+        """
+        Pull library items into the local search index
+
+        Without a watermark the whole library is paged in. With one,
+        only albums and tracks added or updated since then are
+        requested and patched into the index in place. Every page is
+        a separate gateway call so no worker is held for long.
+
+        Args:
+            since: int unix time watermark, None for a full sync
+            page_size: int number of items requested per page
+
+        Returns:
+            int number of entries added or updated
+
+        Raises:
+            PlexTimeoutError: Plex stopped answering mid sync
+        """
+        if since is None:
+            queries = [{}]
+        else:
+            queries = [{"addedAt>>": since}, {"updatedAt>>": since}]
+
+        changed = 0
+        for libtype in ("album", "track"):
+            for filters in queries:
+                start = 0
+                while True:
+                    page = await self.gateway.run(
+                        fetch_page,
+                        self.pms,
+                        self.music.key,
+                        libtype,
+                        start,
+                        page_size,
+                        **filters,
+                    )
+                    # Patch in a worker, commands keep searching meanwhile
+                    await self.bot.loop.run_in_executor(None, self._patch_index, page)
+                    changed += len(page)
+                    if len(page) < page_size:
+                        break
+                    start += page_size
+        return changed
+
+    def _patch_index(self, entries):
+        """
+        Add or replace index entries and advance the watermark
+
+        Args:
+            entries: list of IndexEntry
+
+        Returns:
+            None
+        """
+        for entry in entries:
+            self.index.add(entry)
+            self.index_watermark = max(self.index_watermark, entry.updated_at)
+
+    def _save_index(self):
+        """
+        Write index changes and the watermark to the snapshot
+
+        Blocking, meant to be run in an executor.
+
+        Returns:
+            None
+        """
+        try:
+            self.snapshot.save(self.index, self.index_watermark)
+        except (OSError, sqlite3.Error) as err:
+            plex_log.warning("Unable to save library index: %s", err)
+
+    def _load_index(self):
+        """
+        Fill the index from the on-disk snapshot
+
+        Blocking, meant to be run in an executor.
+
+        Returns:
+            int saved watermark, 0 if nothing was restored
+        """
+        try:
+            return self.snapshot.load(self.index)
+        except (OSError, sqlite3.Error) as err:
+            plex_log.warning("Unable to load library index: %s", err)
+            return 0
+
+    async def _index_task(self):
+        """
+        Coroutine keeping the local search index fresh
+
+        Restores the snapshot on startup, then periodically asks
+        Plex only for items changed since the watermark.
+
+        Returns:
+            None
+
+        Raises:
+            None
+        """
+        since = None
+        if self.snapshot:
+            watermark = await self.bot.loop.run_in_executor(None, self._load_index)
+            if watermark:
+                self.index_watermark = since = watermark
+                plex_log.info("Restored %s indexed items", len(self.index))
+
+        await self.connected.wait()
+        while True:
+            try:
+                changed = await self._sync_index(since)
+            except (
+                PlexTimeoutError,
+                NotFound,
+                BadRequest,
+                requests.RequestException,
+            ) as err:
+                # Retried on the next refresh from the old watermark, a
+                # partial sync must not push it past what was never fetched
+                plex_log.warning("Unable to sync library index: %s", err or "timed out")
+                self.index_watermark = since or 0
+                changed = 0
+            else:
+                since = self.index_watermark
+                plex_log.debug("Index sync: %s changed, %s total", changed, len(self.index))
+
+            if self.snapshot:
+                await self.bot.loop.run_in_executor(None, self._save_index)
+            await asyncio.sleep(self.index_refresh)
+
+    async def _index_search(self, title: str, libtype: str):
+        """
+        Search the local index off the event loop
+
+        Fuzzy scoring of a miss on the exact title takes tens of
+        ms on a large library, too long to hold the loop.
+
+        Args:
+            title: str title to search for
+            libtype: str either track or album
+
+        Returns:
+            IndexEntry of the best match, None on a miss
+        """
+        return await self.bot.loop.run_in_executor(
+            None, self.index.search, title, libtype
+        )
+
+    async def _index_lookup(self, title: str, libtype: str):
+        """
+        Resolve a title through the local index
+
+        Args:
+            title: str title to search for
+            libtype: str either track or album
+
+        Returns:
+            plexapi media object of the best match, None on a miss
+        """
+        if not self.index:
+            return None
+        entry = await self._index_search(title, libtype)
+        if not entry:
+            return None
+        try:
+            return await self.resolver.fetch(entry.rating_key)
+        except NotFound:
+            # Stale entry, removed from Plex since indexing
+            self.index.remove(entry.rating_key)
+            return None
+
+    async def _search_tracks(self, title: str):
         """
         Search the Plex music db for track
 
+        Answers straight from the local index when possible,
+        falls back to a Plex search on a miss.
+
         Args:
             title: str title of song to search for
 
         Returns:
-            plexapi.audio.Track pointing to best matching title
+            QueueEntry pointing to best matching title
 
         Raises:
             MediaNotFoundError: Title of track can't be found in plex db
         """
-        results = self.music.searchTracks(title=title, maxresults=1)
+        if self.index:
+            hit = await self._index_search(title, "track")
+            if hit:
+                return QueueEntry.from_index(hit)
+
+        results = await self.gateway.run(
+            self.music.searchTracks, title=title, maxresults=1
+        )
         try:
-            return results[0]
+            return QueueEntry.from_track(results[0])
         except IndexError:
             raise MediaNotFoundError("Track cannot be found")
 
-    def _search_albums(self, title: str):
+    async def _search_albums(self, title: str):
         """
         Search the Plex music db for album
 
+        Answers from the local index when possible,
+        falls back to a Plex search on a miss.
+
         Args:
             title: str title of album to search for
 
@@ -252,13 +941,19 @@ class Plex(commands.Cog):
         Raises:
             MediaNotFoundError: Title of album can't be found in plex db
         """
-        results = self.music.searchAlbums(title=title, maxresults=1)
+        album = await self._index_lookup(title, "album")
+        if album:
+            return album
+
+        results = await self.gateway.run(
+            self.music.searchAlbums, title=title, maxresults=1
+        )
         try:
             return results[0]
         except IndexError:
             raise MediaNotFoundError("Album cannot be found")
 
-    def _search_playlists(self, title: str):
+    async def _search_playlists(self, title: str):
         """
         Search the Plex music db for playlist
 
@@ -272,28 +967,73 @@ class Plex(commands.Cog):
             MediaNotFoundError: Title of playlist can't be found in plex db
         """
         try:
-            return self.pms.playlist(title)
+            return await self.gateway.run(self.pms.playlist, title)
         except NotFound:
             raise MediaNotFoundError("Playlist cannot be found")
 
-    def _get_playlists(self):
+    def _fetch_entries(self, key: str, start: int):
         """
-        Search the Plex music db for playlist
+        Fetch one page of tracks of an album or playlist
+
+        Blocking, meant to be run through the PlexGateway.
+
+        Args:
+            key: str Plex key listing the tracks
+            start: int container offset
 
         Returns:
-            List of plexapi.playlist
+            Tuple of list of QueueEntry and bool whether more pages follow
         """
-        return self.pms.playlists()
+        headers = {
+            "X-Plex-Container-Start": str(start),
+            "X-Plex-Container-Size": str(self.PAGE_SIZE),
+        }
+        data = self.pms.query(key, headers=headers)
+        entries = [
+            QueueEntry.from_element(elem)
+            for elem in data
+            if elem.attrib.get("type") == "track"
+        ]
+        return entries, len(data) == self.PAGE_SIZE
 
-    async def _play(self):
+    async def _enqueue_paged(self, player, key: str, shuffle: bool = False):
         """
-        Heavy lifting of playing songs
+        Queue all tracks under a Plex key, page by page
 
-        Grabs the appropiate streaming URL, sends the `now playing`
-        message, and initiates playback in the vc.
+        Only the first page is awaited, so playback starts right
+        away. Remaining pages are queued by a background task.
 
         Args:
-            None
+            player: GuildPlayer to queue on
+            key: str Plex key listing the tracks
+            shuffle: bool queue in random order
+
+        Returns:
+            int number of tracks queued so far
+
+        Raises:
+            PlexTimeoutError: First page did not arrive in time
+        """
+        # Shuffled listings only mix among themselves, after what is queued
+        span = ShuffleSpan(player.play_queue) if shuffle else None
+        entries, more = await self.gateway.run(self._fetch_entries, key, 0)
+        player.enqueue_many(entries, span)
+        if more:
+            task = self.bot.loop.create_task(
+                self._enqueue_rest(player, key, self.PAGE_SIZE, span)
+            )
+            player.add_fill(task)
+        return len(entries)
+
+    async def _enqueue_rest(self, player, key: str, start: int, span=None):
+        """
+        Coroutine queueing the remaining pages of a listing
+
+        Args:
+            player: GuildPlayer to queue on
+            key: str Plex key listing the tracks
+            start: int offset of the first page to fetch
+            span: ShuffleSpan to scatter the tracks over, None to append
 
         Returns:
             None
@@ -301,112 +1041,285 @@ class Plex(commands.Cog):
         Raises:
             None
         """
-        track_url = self.current_track.getStreamURL()
-        audio_stream = FFmpegPCMAudio(track_url)
+        more = True
+        while more:
+            try:
+                entries, more = await self.gateway.run(self._fetch_entries, key, start)
+            except PlexTimeoutError:
+                plex_log.warning("Timed out queueing %s at %s, giving up", key, start)
+                return
+            player.enqueue_many(entries, span)
+            start += self.PAGE_SIZE
+        bot_log.debug("Finished queueing %s, %s tracks", key, start)
 
-        while self.voice_channel and self.voice_channel.is_playing():
-            bot_log.debug("waiting for track to finish")
-            await asyncio.sleep(2)
-        bot_log.debug("track finished")
+    def _genius_lyrics(self, entry):
+        """
+        Search Genius for the lyrics of a track
 
-        if self.voice_channel:
-            self.voice_channel.play(audio_stream, after=self._toggle_next)
+        Blocking, meant to be run in an executor.
 
-            plex_log.debug("%s - URL: %s", self.current_track, track_url)
+        Args:
+            entry: QueueEntry of the track
 
-            embed, img = self._build_embed_track(self.current_track)
-            self.np_message_id = await self.ctx.send(embed=embed, file=img)
+        Returns:
+            str lyrics, None if Genius has none
 
-    async def _play_next(self):
+        Raises:
+            requests.RequestException: Genius is unreachable
+        """
+        genius = self._genius_client()
+        if not genius:
+            return None
+        plex_log.info("Searching for %s, %s", entry.title, entry.artist)
         try:
-            from asyncio.exceptions import CancelledError
-        except ImportError:
-            from concurrent.futures._base import CancelledError
-        if self.is_looping:
-            self.current_track = self.is_looping
-        else:
-            try:
-                self.current_track = await self.play_queue.get()
-            except CancelledError:
-                bot_log.debug("failed to pop queue")
+            song = genius.search_song(entry.title, entry.artist)
+        except TypeError:
+            self.lyrics_token = self.genius = None
+            plex_log.error("Invalid genius token, disabling lyrics")
+            return None
+        return song.lyrics if song else None
 
-            if not self.current_track and self.loop_queue:
-                bot_log.debug("swapping loop queue and play queue")
-                for item in self.loop_queue:
-                    await self.play_queue.put(item)
+    async def _find_lyrics(self, entry):
+        """
+        Look lyrics up in the cache, in Plex, then on Genius
 
-                try:
-                    self.current_track = await self.play_queue.get()
-                except CancelledError:
-                    bot_log.debug("failed to pop queue")
+        Args:
+            entry: QueueEntry of the track
+
+        Returns:
+            str lyrics, empty if none could be found
+        """
+        from .lyrics import plex_lyrics
 
-    async def _audio_player_task(self):
+        loop = self.bot.loop
+        key = entry.rating_key
+        text = await loop.run_in_executor(None, self.lyrics_cache.get, key)
+        if text is not None:
+            return text
+
+        # Only remember a miss if every enabled source actually answered,
+        # a skipped source may have lyrics once it is set up
+        answered = True
+        try:
+            text = await self.gateway.run(
+                plex_lyrics, self.pms, self.session, key, self.timeout
+            )
+        except (PlexTimeoutError, NotFound, requests.RequestException) as err:
+            plex_log.debug("No Plex lyrics for %s - %s", entry, err)
+            answered = False
+        if not text and self.lyrics_token:
+            try:
+                text = await loop.run_in_executor(None, self._genius_lyrics, entry)
+            except requests.RequestException as err:
+                plex_log.warning("Unable to reach Genius - %s", err)
+                answered = False
+        if not self.lyrics_token:
+            # No token, or Genius just rejected it
+            answered = False
+
+        if text or answered:
+            text = text or ""
+            await loop.run_in_executor(None, self.lyrics_cache.put, key, text)
+        return text or ""
+
+    def _lyrics_task(self, entry):
         """
-        Coroutine to handle playback and queuing
+        Lyrics lookup of a track, shared by everyone asking for it
+
+        Args:
+            entry: QueueEntry of the track
 
-        Always-running function awaiting new songs to be added.
-        Auto disconnects from VC if idle for > 15 seconds.
-        Handles auto deletion of now playing song notifications.
+        Returns:
+            asyncio.Task resolving to the lyrics
+        """
+        task = self._lyrics_tasks.get(entry.rating_key)
+        if task is None:
+            task = self.bot.loop.create_task(self._find_lyrics(entry))
+            self._lyrics_tasks[entry.rating_key] = task
+            task.add_done_callback(
+                lambda _: self._lyrics_tasks.pop(entry.rating_key, None)
+            )
+        return task
+
+    def prefetch_lyrics(self, entry):
+        """
+        Look up the lyrics of a track in the background
 
         Args:
-            None
+            entry: QueueEntry of the track
 
         Returns:
             None
+        """
+        self._lyrics_task(entry)
 
-        Raises:
-            None
+    async def _get_playlists(self):
         """
-        while True:
-            self.play_next_event.clear()
-            if self.voice_channel:
-                try:
-                    # Disconnect after 15 seconds idle
-                    async with timeout(15):
-                        await self._play_next()
-                except asyncio.TimeoutError:
-                    bot_log("timeout - disconnecting")
-                    await self.voice_channel.disconnect()
-                    self.voice_channel = None
+        Search the Plex music db for playlist
+
+        Returns:
+            List of plexapi.playlist
+        """
+        return await self.gateway.run(self.pms.playlists)
+
+    def _transcode_url(self, track):
+        """
+        Universal transcoder URL streaming a track as Ogg Opus
+
+        Args:
+            track: plexapi.audio.Track object of song
 
-            if not self.current_track:
-                await self._play_next()
+        Returns:
+            str stream URL
+        """
+        params = {
+            "path": track.key,
+            "protocol": "http",
+            "directPlay": 0,
+            "directStream": 0,
+            "musicBitrate": self.bitrate,
+            "session": uuid.uuid4().hex,
+            "X-Plex-Client-Identifier": X_PLEX_IDENTIFIER,
+            "X-Plex-Client-Profile-Extra": (
+                "add-transcode-target(type=musicProfile&context=streaming"
+                "&protocol=http&container=ogg&audioCodec=opus)"
+            ),
+        }
+        return self.pms.url(
+            f"/music/:/transcode/universal/start?{urlencode(params)}", includeToken=True
+        )
+
+    def _audio_source(self, track):
+        """
+        Build the discord audio source for a track
 
-            await self._play()
-            await self.play_next_event.wait()
-            if self.np_message_id:
-                await self.np_message_id.delete()
+        pcm: FFmpeg decodes to PCM, discord.py encodes Opus per frame.
+        opus: FFmpeg hands over Opus packets, copying the stream
+              untouched when the file already is Opus.
+        transcode: Plex transcodes to Opus, FFmpeg only remuxes.
+
+        Args:
+            track: plexapi.audio.Track object of song
 
-    def _toggle_next(self, error=None):
+        Returns:
+            Tuple of discord.AudioSource and str stream URL
         """
-        Callback for vc playback
+        with metrics.SOURCE_SECONDS.time():
+            return self._create_source(track)
+
+    def _create_source(self, track):
+        if self.audio_mode == "pcm":
+            url = track.getStreamURL()
+            return FFmpegPCMAudio(url), url
 
-        Clears current track, then activates _audio_player_task
-        to play next in queue or disconnect.
+        # discord.py copies the stream for codec "opus", any other
+        # value, "copy" included, re-encodes with libopus
+        if self.audio_mode == "transcode":
+            # Plex already produces Opus at the configured bitrate
+            url = self._transcode_url(track)
+            return FFmpegOpusAudio(url, codec="opus", bitrate=self.bitrate), url
+
+        url = track.getStreamURL()
+        codec = track.media[0].audioCodec if track.media else None
+        if codec == "opus":
+            return FFmpegOpusAudio(url, codec="opus", bitrate=self.bitrate), url
+        return FFmpegOpusAudio(url, bitrate=self.bitrate), url
+
+    def _get_player(self, ctx, create: bool = True):
+        """
+        Get the player of the guild a command came from
 
         Args:
-            error: Optional parameter required for discord.py callback
+            ctx: discord.ext.commands.Context message context from command
+            create: bool make a new player if the guild has none
 
         Returns:
-            None
+            GuildPlayer of the guild, None if there is none and create is False
+        """
+        player = self.players.get(ctx.guild.id)
+        if player and player.task.done():
+            player = None
+        if not player and create:
+            player = GuildPlayer(self, ctx.guild.id)
+            self.players[ctx.guild.id] = player
+        if player:
+            # Save the context to use with async callbacks
+            player.ctx = ctx
+        return player
 
-        Raises:
+    def _reap_player(self, player):
+        """
+        Forget an idle player
+
+        Args:
+            player: GuildPlayer which has stopped
+
+        Returns:
             None
         """
-        self.current_track = None
-        self.bot.loop.call_soon_threadsafe(self.play_next_event.set)
+        if self.players.get(player.guild_id) is player:
+            del self.players[player.guild_id]
+            bot_log.debug("Reaped idle player of guild %s", player.guild_id)
+
+    def _fetch_art(self, path: str, updated_at):
+        """
+        Get an art attachment through the thumbnail cache
+
+        Art is requested pre-scaled from the Plex photo transcoder,
+        so neither Plex nor discord has to move full size images.
+
+        Args:
+            path: str Plex thumb path
+            updated_at: updatedAt of the owning item
+
+        Returns:
+            discord.File of the art, None if there is no art or
+            it could not be fetched, failures are not cached
+        """
+        if not path:
+            return None
+
+        if self.thumb_size:
+            params = {
+                "url": path,
+                "width": self.thumb_size,
+                "height": self.thumb_size,
+                "minSize": 1,
+                "upscale": 0,
+            }
+            key = f"/photo/:/transcode?{urlencode(params)}"
+        else:
+            key = path
+
+        @metrics.ART_SECONDS.time()
+        def fetch():
+            response = self.session.get(
+                self.pms.url(key, includeToken=True), timeout=self.timeout
+            )
+            response.raise_for_status()
+            return response.content
 
-    @staticmethod
-    def _build_embed_track(track, type_="play"):
+        try:
+            data = self.thumbs.get(key, updated_at, fetch)
+        except requests.RequestException as err:
+            # The error's URL carries the token, only log the path
+            status = getattr(err.response, "status_code", type(err).__name__)
+            plex_log.warning("Unable to fetch art %s - %s", path, status)
+            return None
+        return discord.File(io.BytesIO(data), filename="image0.png")
+
+    @metrics.EMBED_SECONDS.time(type="track")
+    def _build_embed_track(self, track, type_="play"):
         """
         Creates a pretty embed card for tracks
 
         Builds a helpful status embed with the following info:
         Status, song title, album, artist and album art. All
-        pertitent information is grabbed dynamically from the Plex db.
+        details come from the queue entry, only the art is
+        grabbed from the Plex db.
 
         Args:
-            track: plexapi.audio.Track object of song
+            track: QueueEntry of song
             type_: Type of card to make (play, queue).
 
         Returns:
@@ -417,14 +1330,8 @@ class Plex(commands.Cog):
             ValueError: Unsupported type of embed {type_}
         """
         # Grab the relevant thumbnail
-        if track.thumbUrl:
-            img_stream = requests.get(track.thumbUrl, stream=True).raw
-            img = io.BytesIO(img_stream.read())
-
-            # Attach to discord embed
-            art_file = discord.File(img, filename="image0.png")
-        else:
-            art_file = None
+        # Thumb paths carry their own version stamp
+        art_file = self._fetch_art(track.thumb, None)
 
         # Get appropiate status message
         if type_ == "play":
@@ -437,7 +1344,7 @@ class Plex(commands.Cog):
             raise ValueError(f"Unsupported type of embed {type_}")
 
         # Include song details
-        descrip = f"{track.album().title} - {track.artist().title}"
+        descrip = f"{track.album} - {track.artist}"
 
         # Build the actual embed
         embed = discord.Embed(
@@ -445,20 +1352,21 @@ class Plex(commands.Cog):
         )
         embed.set_author(name="Plex")
         # Point to file attached with ctx object.
-        embed.set_thumbnail(url="attachment://image0.png")
+        if art_file:
+            embed.set_thumbnail(url="attachment://image0.png")
 
         bot_log.debug("Built embed for track - %s", track.title)
 
         return embed, art_file
 
-    @staticmethod
-    def _build_embed_album(album):
+    @metrics.EMBED_SECONDS.time(type="album")
+    def _build_embed_album(self, album):
         """
         Creates a pretty embed card for albums
 
         Builds a helpful status embed with the following info:
-        album, artist, and album art. All pertitent information
-        is grabbed dynamically from the Plex db.
+        album, artist, and album art. Titles come from the album
+        itself, only the art is grabbed from the Plex db.
 
         Args:
             album: plexapi.audio.Album object of album
@@ -471,13 +1379,9 @@ class Plex(commands.Cog):
             None
         """
         # Grab the relevant thumbnail
-        img_stream = requests.get(album.thumbUrl, stream=True).raw
-        img = io.BytesIO(img_stream.read())
-
-        # Attach to discord embed
-        art_file = discord.File(img, filename="image0.png")
+        art_file = self._fetch_art(album.thumb, album.updatedAt)
         title = "Added album to queue"
-        descrip = f"{album.title} - {album.artist().title}"
+        descrip = f"{album.title} - {album.parentTitle}"
 
         embed = discord.Embed(
             title=title, description=descrip, colour=discord.Color.red()
@@ -488,7 +1392,7 @@ class Plex(commands.Cog):
 
         return embed, art_file
 
-    @staticmethod
+    @metrics.EMBED_SECONDS.time(type="playlist")
     def _build_embed_playlist(self, playlist, title, descrip):
         """
         Creates a pretty embed card for playlists
@@ -507,53 +1411,122 @@ class Plex(commands.Cog):
         Raises:
             None
         """
-        # Grab the relevant thumbnail
-        try:
-            img_stream = requests.get(self.pms.url(playlist.composite, True), stream=True).raw
-            img = io.BytesIO(img_stream.read())
-        except:
-            raise MediaNotFoundError("no image available")
-
-        # Attach to discord embed
-        art_file = discord.File(img, filename="image0.png")
+        # Grab the relevant thumbnail, the card goes out without one if need be
+        art_file = self._fetch_art(playlist.composite, playlist.updatedAt)
 
         embed = discord.Embed(
             title=title, description=descrip, colour=discord.Color.red()
         )
         embed.set_author(name="Plex")
-        embed.set_thumbnail(url="attachment://image0.png")
+        if art_file:
+            embed.set_thumbnail(url="attachment://image0.png")
         bot_log.debug("Built embed for playlist - %s", playlist.title)
 
         return embed, art_file
 
-    async def _validate(self, ctx):
+    @metrics.EMBED_SECONDS.time(type="queue")
+    def _build_embed_queue(self, player, page: int):
         """
-        Ensures user is in a vc
+        Creates a single embed listing one page of the queue
+
+        Built purely from the queue entries, no requests are
+        made no matter how long the queue is.
 
         Args:
-            ctx: discord.ext.commands.Context message context from command
+            player: GuildPlayer whose queue to show
+            page: int page to show, clamped to the valid range
+
+        Returns:
+            embed: discord.embed fully constructed payload.
+            page: int page actually shown.
+            pages: int total number of pages.
+
+        Raises:
+            None
+        """
+        size = self.QUEUE_PAGE_SIZE
+        total = len(player.play_queue)
+        pages = max(1, -(-total // size))
+        page = max(0, min(page, pages - 1))
+        start = page * size
+
+        lines = []
+        for pos, entry in enumerate(player.play_queue.slice(start, start + size)):
+            minutes, seconds = divmod(entry.duration // 1000, 60)
+            lines.append(
+                f"`{start + pos + 1}.` **{entry.title}** - {entry.artist}"
+                f" `{minutes}:{seconds:02}`"
+            )
+        descrip = "\n".join(lines) or "Nothing queued."
+
+        embed = discord.Embed(
+            title="Queue", description=descrip, colour=discord.Color.red()
+        )
+        embed.set_author(name="Plex")
+        if player.current_entry:
+            current = player.current_entry
+            embed.add_field(
+                name="Now Playing", value=f"{current.title} - {current.artist}"
+            )
+        footer = f"Page {page + 1}/{pages} - {total} tracks"
+        if player.fills:
+            footer += " (still loading)"
+        embed.set_footer(text=footer)
+
+        return embed, page, pages
+
+    async def _page_queue(self, player, msg, page: int):
+        """
+        Coroutine flipping the queue view on reactions
+
+        Runs until no one has reacted for QUEUE_VIEW_TIMEOUT.
+
+        Args:
+            player: GuildPlayer whose queue is shown
+            msg: discord.Message holding the queue view
+            page: int page currently shown
 
         Returns:
             None
 
         Raises:
-            VoiceChannelError: Author not in voice channel
+            None
         """
-        # Fail if user not in vc
-        if not ctx.author.voice:
-            await ctx.send("Join a voice channel first!")
-            bot_log.debug("Failed to play, requester not in voice channel")
-            raise VoiceChannelError
 
-        # Connect to voice if not already
-        if not self.voice_channel:
+        def check(reaction, user):
+            return (
+                reaction.message.id == msg.id
+                and str(reaction.emoji) in (self.PREV_PAGE, self.NEXT_PAGE)
+                and user != self.bot.user
+            )
+
+        while True:
+            try:
+                reaction, user = await self.bot.wait_for(
+                    "reaction_add", check=check, timeout=self.QUEUE_VIEW_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                break
+
+            step = -1 if str(reaction.emoji) == self.PREV_PAGE else 1
+            embed, page, _ = self._build_embed_queue(player, page + step)
+            try:
+                await msg.edit(embed=embed)
+            except discord.errors.NotFound:
+                return
             try:
-                self.voice_channel = await ctx.author.voice.channel.connect()
-                bot_log.debug("Connected to vc.")
-            except asyncio.exceptions.TimeoutError:
-                bot_log.debug("Cannot connect to vc - timeout")
+                await msg.remove_reaction(reaction.emoji, user)
+            except (discord.errors.Forbidden, discord.errors.NotFound):
+                # Needs manage messages, users can unreact themselves
+                pass
+
+        try:
+            await msg.clear_reactions()
+        except (discord.errors.Forbidden, discord.errors.NotFound):
+            pass
 
     @command()
+    @plex_available()
     async def play(self, ctx, *args):
         """
         User command to play song
@@ -571,32 +1544,38 @@ class Plex(commands.Cog):
         Raises:
             None
         """
-        # Save the context to use with async callbacks
-        self.ctx = ctx
         title = " ".join(args)
 
         try:
-            track = self._search_tracks(title)
+            track = await self._search_tracks(title)
         except MediaNotFoundError:
             await ctx.send(f"Can't find song: {title}")
             bot_log.debug("Failed to play, can't find song - %s", title)
             return
+        except PlexTimeoutError:
+            await ctx.send("Plex is taking too long to respond, try again later.")
+            return
 
+        player = self._get_player(ctx)
         try:
-            await self._validate(ctx)
+            await player.connect(ctx)
         except VoiceChannelError:
             pass
 
+        # Queue before building the card, a slow card never loses the song
+        queued = player.voice_channel and player.voice_channel.is_playing()
+        await player.enqueue(track)
+
         # Specific add to queue message
-        if self.voice_channel and self.voice_channel.is_playing():
+        if queued:
             bot_log.debug("Added to queue - %s", title)
-            embed, img = self._build_embed_track(track, type_="queue")
+            embed, img = await self.gateway.run(
+                self._build_embed_track, track, type_="queue"
+            )
             await ctx.send(embed=embed, file=img)
 
-        # Add the song to the async queue
-        await self.play_queue.put(track)
-
     @command()
+    @plex_available()
     async def album(self, ctx, *args):
         """
         User command to play song
@@ -614,61 +1593,68 @@ class Plex(commands.Cog):
         Raises:
             None
         """
-        # Save the context to use with async callbacks
-        self.ctx = ctx
         title = " ".join(args)
 
         try:
-            album = self._search_albums(title)
+            album = await self._search_albums(title)
         except MediaNotFoundError:
             await ctx.send(f"Can't find album: {title}")
             bot_log.debug("Failed to queue album, can't find - %s", title)
             return
+        except PlexTimeoutError:
+            await ctx.send("Plex is taking too long to respond, try again later.")
+            return
 
+        player = self._get_player(ctx)
         try:
-            await self._validate(ctx)
+            await player.connect(ctx)
         except VoiceChannelError:
             pass
 
         bot_log.debug("Added to queue - %s", title)
-        embed, img = self._build_embed_album(album)
-        await ctx.send(embed=embed, file=img)
+        await self._enqueue_paged(player, f"/library/metadata/{album.ratingKey}/children")
 
-        for track in album.tracks():
-            await self.play_queue.put(track)
+        embed, img = await self.gateway.run(self._build_embed_album, album)
+        await ctx.send(embed=embed, file=img)
 
-    async def play_playlist(self, title, shuffle=False):
+    async def play_playlist(self, ctx, title, shuffle=False):
         try:
-            playlist = self._search_playlists(title)
+            playlist = await self._search_playlists(title)
         except MediaNotFoundError:
-            await self.ctx.send(f"Can't find playlist: {title}")
+            await ctx.send(f"Can't find playlist: {title}")
             bot_log.debug("Failed to queue playlist, can't find - %s", title)
             return
+        except PlexTimeoutError:
+            await ctx.send("Plex is taking too long to respond, try again later.")
+            return
 
+        player = self._get_player(ctx)
         try:
-            await self._validate(self.ctx)
+            await player.connect(ctx)
         except VoiceChannelError:
             pass
 
-        try:
-            embed, img = self._build_embed_playlist(self, playlist, "Added playlist to queue", playlist.title)
-            await self.ctx.send(embed=embed, file=img)
-
-            items = [ item for item in playlist.items() if item.TYPE == "track" ]
-            if shuffle:
-                from random import shuffle
-                shuffle(items)
-
-            for item in items:
-                await self.play_queue.put(item)
-
-            bot_log.debug("Added to queue - %s", title)
-
-        except MediaNotFoundError:
-            await self.ctx.send(message="Playlist "+title+" seems to be empty!")
+        queued = 0
+        if playlist.leafCount:
+            queued = await self._enqueue_paged(
+                player, f"/playlists/{playlist.ratingKey}/items", shuffle=shuffle
+            )
+        if not queued:
+            await ctx.send("Playlist " + title + " seems to be empty!")
             bot_log.debug("Playlist empty - %s", title)
+            return
+
+        embed, img = await self.gateway.run(
+            self._build_embed_playlist,
+            playlist,
+            "Added playlist to queue",
+            playlist.title,
+        )
+        await ctx.send(embed=embed, file=img)
+        bot_log.debug("Added to queue - %s", title)
 
     @command()
+    @plex_available()
     async def playlist(self, ctx, *args):
         """
         User command to play playlist
@@ -686,12 +1672,11 @@ class Plex(commands.Cog):
         Raises:
             None
         """
-        # Save the context to use with async callbacks
-        self.ctx = ctx
         title = " ".join(args)
-        await self.play_playlist(title)
+        await self.play_playlist(ctx, title)
 
     @command()
+    @plex_available()
     async def playlist_shuffle(self, ctx, *args):
         """
         User command to play playlist in shuffle mode
@@ -709,13 +1694,12 @@ class Plex(commands.Cog):
         Raises:
             None
         """
-        # Save the context to use with async callbacks
-        self.ctx = ctx
         title = " ".join(args)
-        await self.play_playlist(title,shuffle=True)
+        await self.play_playlist(ctx, title, shuffle=True)
 
 
     @command()
+    @plex_available()
     async def show_playlists(self, ctx, *args):
         """
         User command to show playlists
@@ -732,31 +1716,44 @@ class Plex(commands.Cog):
         Raises:
             None
         """
-        # Save the context to use with async callbacks
-        self.ctx = ctx
-
-        playlists = self._get_playlists()
+        try:
+            playlists = await self._get_playlists()
+        except PlexTimeoutError:
+            await ctx.send("Plex is taking too long to respond, try again later.")
+            return
 
         try:
-            await self._validate(ctx)
+            await self._get_player(ctx).connect(ctx)
         except VoiceChannelError:
             pass
 
-        for playlist in playlists:
-            if args and not any(arg in playlist.title for arg in args):
+        # Build every card at once, then send them in order
+        cards = [
+            self.gateway.run(
+                self._build_embed_playlist,
+                playlist,
+                playlist.title,
+                format_duration(playlist.duration),
+            )
+            for playlist in playlists
+            if playlist.duration
+            and (not args or any(arg in playlist.title for arg in args))
+        ]
+        sends = []
+        for card in await asyncio.gather(*cards, return_exceptions=True):
+            if isinstance(card, Exception):
+                bot_log.debug("Unable to build playlist card - %s", card)
                 continue
-            from datetime import timedelta
-            if playlist.duration:
-                seconds = playlist.duration / 1000
-                embed, img = self._build_embed_playlist(self, playlist, playlist.title, "{:0>8}".format(str(timedelta(seconds=seconds))))
-                await ctx.send(embed=embed, file=img)
+            embed, img = card
+            sends.append(self.outbox.send(ctx.channel, embed=embed, file=img))
+        await asyncio.gather(*sends)
 
     @command()
     async def stop(self, ctx):
         """
         User command to stop playback
 
-        Stops playback and disconnects from vc.
+        Stops playback, clears the queue and disconnects from vc.
 
         Args:
             ctx: discord.ext.commands.Context message context from command
@@ -767,11 +1764,12 @@ class Plex(commands.Cog):
         Raises:
             None
         """
-        if self.voice_channel:
-            self.voice_channel.stop()
-            await self.voice_channel.disconnect()
-            self.voice_channel = None
-            self.ctx = None
+        player = self._get_player(ctx, create=False)
+        if player and player.voice_channel:
+            player.play_queue.clear()
+            player.loop_queue = None
+            player.is_looping = False
+            await player.disconnect()
             bot_log.debug("Stopped")
             await ctx.send(":stop_button: Stopped")
 
@@ -789,8 +1787,10 @@ class Plex(commands.Cog):
         Raises:
             None
         """
-        bot_log.debug("Looping "+str(self.current_track))
-        self.is_looping = self.current_track
+        player = self._get_player(ctx, create=False)
+        if player:
+            bot_log.debug("Looping " + str(player.current_entry))
+            player.is_looping = player.current_entry
 
     @command()
     async def loopq(self, ctx):
@@ -806,13 +1806,15 @@ class Plex(commands.Cog):
         Raises:
             None
         """
+        player = self._get_player(ctx, create=False)
+        if not player:
+            return
         bot_log.debug("Looping current queue")
-        if self.current_track:
-            self.loop_queue = [ self.current_track ]
+        if player.current_entry:
+            player.loop_queue = [player.current_entry]
         else:
-            self.loop_queue = []
-        for item in self.play_queue._queue:
-            self.loop_queue.append(item)
+            player.loop_queue = []
+        player.loop_queue.extend(player.play_queue)
 
     @command()
     async def unloop(self, ctx):
@@ -828,8 +1830,10 @@ class Plex(commands.Cog):
         Raises:
             None
         """
-        bot_log.debug("Looping current queue")
-        self.is_looping = False
+        player = self._get_player(ctx, create=False)
+        if player:
+            bot_log.debug("Unlooping current track")
+            player.is_looping = False
 
     @command()
     async def unloopq(self, ctx):
@@ -845,8 +1849,10 @@ class Plex(commands.Cog):
         Raises:
             None
         """
-        bot_log.debug("Unlooping")
-        self.loop_queue = None
+        player = self._get_player(ctx, create=False)
+        if player:
+            bot_log.debug("Unlooping")
+            player.loop_queue = None
 
 
     @command()
@@ -866,8 +1872,9 @@ class Plex(commands.Cog):
         Raises:
             None
         """
-        if self.voice_channel:
-            self.voice_channel.pause()
+        player = self._get_player(ctx, create=False)
+        if player and player.voice_channel:
+            player.voice_channel.pause()
             bot_log.debug("Paused")
             await ctx.send(":play_pause: Paused")
 
@@ -885,8 +1892,9 @@ class Plex(commands.Cog):
         Raises:
             None
         """
-        if self.voice_channel:
-            self.voice_channel.resume()
+        player = self._get_player(ctx, create=False)
+        if player and player.voice_channel:
+            player.voice_channel.resume()
             bot_log.debug("Resumed")
             await ctx.send(":play_pause: Resumed")
 
@@ -910,16 +1918,17 @@ class Plex(commands.Cog):
         n = 1
         if args:
             n = int(args[0])
-        bot_log.debug("Skipping "+str(n))
-        if self.voice_channel:
-            self.voice_channel.stop()
+        bot_log.debug("Skipping " + str(n))
+        player = self._get_player(ctx, create=False)
+        if player and player.voice_channel:
+            # Drop the extra tracks before stopping, stopping
+            # wakes the player which takes the next one at once
+            player.play_queue.skip(n - 1)
+            player.voice_channel.stop()
             bot_log.debug("Skipped")
-            if n>1:
-                for i in range(n-1):
-                    await self.play_queue.get()
-            self._toggle_next()
 
     @command(name="np")
+    @plex_available()
     async def now_playing(self, ctx):
         """
         User command to get currently playing song.
@@ -936,29 +1945,36 @@ class Plex(commands.Cog):
         Raises:
             None
         """
-        if self.current_track:
-            embed, img = self._build_embed_track(self.current_track,type_="play")
+        player = self._get_player(ctx, create=False)
+        if player and player.current_entry:
+            embed, img = await self.gateway.run(
+                self._build_embed_track, player.current_entry, type_="play"
+            )
             bot_log.debug("Now playing")
-            if self.np_message_id:
+            if player.np_message_id:
                 try:
-                    await self.np_message_id.delete()
+                    await player.np_message_id.delete()
                     bot_log.debug("Deleted old np status")
                 except discord.errors.NotFound:
                     pass
 
             bot_log.debug("Created np status")
-            self.np_message_id = await ctx.send(embed=embed, file=img)
+            player.np_message_id = await self.outbox.send(
+                ctx.channel, embed=embed, file=img, key="now_playing"
+            )
 
     @command(name="q")
-    async def show_queue(self, ctx):
+    async def show_queue(self, ctx, page: int = 1):
         """
         User command to print the current queue
 
-        Deletes old `now playing` status message,
-        Creates a new one with up to date information.
+        Deletes the old queue message, creates a new one
+        showing a single page of the queue. Reacting with
+        the arrows flips through the pages.
 
         Args:
             ctx: discord.ext.commands.Context message context from command
+            page: int page to start on, 1 being up next
 
         Returns:
             None
@@ -966,21 +1982,30 @@ class Plex(commands.Cog):
         Raises:
             None
         """
-        bot_log.debug("Deleted old queue messages")
-        for msg in self.show_queue_message_ids:
-            await msg.delete()
-
-        # need to do this in order to avoid errors when queue is modified during inspection
-        elems = []
-        for track in self.play_queue._queue:
-            elems.append(track)
-
-        for track in elems:
-            embed, img = self._build_embed_track(track,type_="queued")
-            bot_log.debug("Show queue")
+        player = self._get_player(ctx, create=False)
+        if not player:
+            return
 
-            bot_log.debug("Created queue message")
-            self.show_queue_message_ids.append(await ctx.send(embed=embed, file=img))
+        if player.queue_message:
+            bot_log.debug("Deleted old queue message")
+            if player.queue_view_task:
+                player.queue_view_task.cancel()
+            try:
+                await player.queue_message.delete()
+            except discord.errors.NotFound:
+                pass
+            player.queue_message = None
+
+        embed, page, pages = self._build_embed_queue(player, page - 1)
+        msg = await self.outbox.send(ctx.channel, embed=embed)
+        bot_log.debug("Created queue message")
+        player.queue_message = msg
+        if pages > 1:
+            await msg.add_reaction(self.PREV_PAGE)
+            await msg.add_reaction(self.NEXT_PAGE)
+            player.queue_view_task = self.bot.loop.create_task(
+                self._page_queue(player, msg, page)
+            )
 
     @command()
     async def clear(self, ctx):
@@ -996,12 +2021,98 @@ class Plex(commands.Cog):
         Raises:
             None
         """
-        self.play_queue = asyncio.Queue()
-        self.loop_queue = None
+        player = self._get_player(ctx, create=False)
+        if player:
+            player.cancel_fills()
+            player.play_queue.clear()
+            player.loop_queue = None
+            player.queue_changed()
         bot_log.debug("Cleared queue")
         await ctx.send(":boom: Queue cleared.")
 
     @command()
+    async def remove(self, ctx, position: int):
+        """
+        User command to remove a song from the queue
+
+        Args:
+            ctx: discord.ext.commands.Context message context from command
+            position: int 1 based position in the queue
+
+        Returns:
+            None
+
+        Raises:
+            None
+        """
+        player = self._get_player(ctx, create=False)
+        if not player:
+            return
+        try:
+            if position < 1:
+                raise IndexError
+            entry = player.play_queue.remove(position - 1)
+        except IndexError:
+            await ctx.send(f"Nothing queued at position {position}.")
+            return
+        player.queue_changed()
+        bot_log.debug("Removed %s from queue", entry)
+        await ctx.send(f":wastebasket: Removed {entry.title}.")
+
+    @command()
+    async def move(self, ctx, src: int, dst: int):
+        """
+        User command to move a song within the queue
+
+        Args:
+            ctx: discord.ext.commands.Context message context from command
+            src: int 1 based position of the song
+            dst: int 1 based position to move it to
+
+        Returns:
+            None
+
+        Raises:
+            None
+        """
+        player = self._get_player(ctx, create=False)
+        if not player:
+            return
+        try:
+            if src < 1:
+                raise IndexError
+            entry = player.play_queue.move(src - 1, max(dst - 1, 0))
+        except IndexError:
+            await ctx.send(f"Nothing queued at position {src}.")
+            return
+        player.queue_changed()
+        bot_log.debug("Moved %s to %s", entry, dst)
+        await ctx.send(f":arrow_right_hook: Moved {entry.title} to {dst}.")
+
+    @command()
+    async def shuffle(self, ctx):
+        """
+        User command to shuffle the queue
+
+        Args:
+            ctx: discord.ext.commands.Context message context from command
+
+        Returns:
+            None
+
+        Raises:
+            None
+        """
+        player = self._get_player(ctx, create=False)
+        if not player:
+            return
+        player.play_queue.shuffle()
+        player.queue_changed()
+        bot_log.debug("Shuffled queue")
+        await ctx.send(":twisted_rightwards_arrows: Queue shuffled.")
+
+    @command()
+    @plex_available()
     async def lyrics(self, ctx):
         """
         User command to get lyrics of a song.
@@ -1015,40 +2126,23 @@ class Plex(commands.Cog):
             Raises:
                 None
         """
-        if not self.current_track:
+        player = self._get_player(ctx, create=False)
+        if not player or not player.current_entry:
             plex_log.info("No song currently playing")
             return
+        track = player.current_entry
 
-        if self.genius:
-            plex_log.info(
-                "Searching for %s, %s",
-                self.current_track.title,
-                self.current_track.artist().title,
-            )
-            try:
-                song = self.genius.search_song(
-                    self.current_track.title, self.current_track.artist().title
-                )
-            except TypeError:
-                self.genius = None
-                plex_log.error("Invalid genius token, disabling lyrics")
-                return
+        # Shielded, so a cancelled command doesn't abort the shared lookup
+        lyrics = await asyncio.shield(self._lyrics_task(track))
+        if not lyrics:
+            plex_log.info("Could not find lyrics")
+            await ctx.send("Can't find lyrics for this song.")
+            return
 
-            try:
-                lyrics = song.lyrics
-                # Split into 1950 char chunks
-                # Discord max message length is 2000
-                lines = [(lyrics[i : i + 1950]) for i in range(0, len(lyrics), 1950)]
-
-                for i in lines:
-                    if i == "":
-                        continue
-                    # Apply code block format
-                    i = f"```{i}```"
-                    await ctx.send(i)
-
-            except (IndexError, TypeError):
-                plex_log.info("Could not find lyrics")
-                await ctx.send("Can't find lyrics for this song.")
-        else:
-            plex_log.warning("Attempted lyrics without valid token")
+        # Split into 1950 char chunks
+        # Discord max message length is 2000
+        lines = [(lyrics[i : i + 1950]) for i in range(0, len(lyrics), 1950)]
+
+        # Queued together, so short chunks share a message
+        sends = [self.outbox.send(ctx.channel, f"```{i}```") for i in lines if i]
+        await asyncio.gather(*sends)
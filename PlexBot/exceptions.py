@@ -1,3 +1,6 @@
+from discord.ext.commands import CheckFailure
+
+
 class MediaNotFoundError(Exception):
     """Raised when a PlexAPI media resource cannot be found."""
 
@@ -8,3 +11,15 @@ class VoiceChannelError(Exception):
     """Raised when user is not connected to a voice channel."""
 
     pass
+
+
+class PlexTimeoutError(Exception):
+    """Raised when the Plex server does not answer in time."""
+
+    pass
+
+
+class PlexUnavailableError(CheckFailure):
+    """Raised when a command needs Plex while it is unreachable."""
+
+    pass
@@ -0,0 +1,173 @@
+"""Asynchronous gateway for all blocking Plex requests."""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import metrics
+from .exceptions import PlexTimeoutError
+
+plex_log = logging.getLogger("Plex")
+
+
+class PlexGateway:
+    """
+    Runs blocking plexapi calls off the event loop
+
+    Every call is submitted to a bounded thread pool and awaited
+    with a timeout, so a slow Plex server can never freeze the
+    discord gateway. Calls still waiting for a worker when they
+    time out or get cancelled are dropped before they start.
+    """
+
+    def __init__(self, max_workers: int = 4, timeout: float = 10.0):
+        """
+        Initializes the worker pool
+
+        Args:
+            max_workers: int maximum number of concurrent Plex requests
+            timeout: float default per-call timeout in seconds
+
+        Returns:
+            None
+
+        Raises:
+            None
+        """
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="plex"
+        )
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.queued = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def _invoke(self, func, args, kwargs):
+        """
+        Worker side wrapper keeping queue depth accurate
+
+        Args:
+            func: callable blocking function to run
+            args: tuple positional arguments for func
+            kwargs: dict keyword arguments for func
+
+        Returns:
+            Return value of func
+
+        Raises:
+            Any exception raised by func
+        """
+        with self._lock:
+            self.queued -= 1
+            self.in_flight += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    async def run(self, func, *args, timeout: float = None, **kwargs):
+        """
+        Run a blocking callable in the Plex worker pool
+
+        Args:
+            func: callable blocking function, usually a plexapi method
+            *args: positional arguments for func
+            timeout: float seconds to wait, defaults to the gateway timeout
+            **kwargs: keyword arguments for func
+
+        Returns:
+            Return value of func
+
+        Raises:
+            PlexTimeoutError: Call did not finish within the timeout
+        """
+        if timeout is None:
+            timeout = self.timeout
+
+        with self._lock:
+            self.queued += 1
+        future = self._executor.submit(self._invoke, func, args, kwargs)
+        start = time.monotonic()
+        name = getattr(func, "__name__", type(func).__name__)
+        status = "ok"
+        metrics.PLEX_IN_FLIGHT.inc()
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            self._drop(future)
+            self.timeouts += 1
+            status = "timeout"
+            plex_log.warning("Plex call %s timed out after %ss", func, timeout)
+            raise PlexTimeoutError(f"Plex did not respond within {timeout}s")
+        except asyncio.CancelledError:
+            self._drop(future)
+            status = "cancelled"
+            raise
+        except Exception:
+            self.failures += 1
+            status = "error"
+            raise
+        finally:
+            latency = time.monotonic() - start
+            self.calls += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            metrics.PLEX_IN_FLIGHT.dec()
+            metrics.PLEX_SECONDS.observe(latency, call=name)
+            metrics.PLEX_CALLS.inc(call=name, status=status)
+
+    def _drop(self, future):
+        """
+        Cancel a call that has not been picked up by a worker yet
+
+        Args:
+            future: concurrent.futures.Future of the submitted call
+
+        Returns:
+            None
+
+        Raises:
+            None
+        """
+        if future.cancel():
+            with self._lock:
+                self.queued -= 1
+
+    def stats(self):
+        """
+        Snapshot of gateway metrics
+
+        Returns:
+            Dict of queue depth, in flight calls and latency figures.
+        """
+        with self._lock:
+            queued, in_flight = self.queued, self.in_flight
+        avg = self.total_latency / self.calls if self.calls else 0.0
+        return {
+            "queued": queued,
+            "in_flight": in_flight,
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "avg_latency": avg,
+            "max_latency": self.max_latency,
+        }
+
+    def shutdown(self):
+        """
+        Stop the worker pool, discarding pending calls
+
+        Returns:
+            None
+        """
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,471 @@
+"""In-memory search index of the Plex music library."""
+import logging
+import re
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from collections import Counter
+from collections import namedtuple
+from difflib import SequenceMatcher
+
+try:
+    from fuzzywuzzy import fuzz
+except ImportError:
+    fuzz = None
+
+plex_log = logging.getLogger("Plex")
+
+# Plex metadata type ids
+LIBTYPES = {"album": 9, "track": 10}
+
+IndexEntry = namedtuple(
+    "IndexEntry",
+    [
+        "rating_key",
+        "libtype",
+        "title",
+        "album",
+        "artist",
+        "thumb",
+        "duration",
+        "updated_at",
+    ],
+)
+
+_STRIP = re.compile(r"[^\w ]+")
+
+
+def normalize(text: str) -> str:
+    """
+    Normalize a title for matching
+
+    Lowercases, strips accents and punctuation, and collapses whitespace.
+
+    Args:
+        text: str raw title
+
+    Returns:
+        str normalized title
+    """
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(_STRIP.sub(" ", text.lower()).split())
+
+
+def trigrams(text: str):
+    """
+    Split a normalized string into its padded character trigrams
+
+    Args:
+        text: str normalized text
+
+    Returns:
+        Set of str trigrams
+    """
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def entry_from_element(elem, libtype: str) -> IndexEntry:
+    """
+    Build an index entry from a raw Plex XML element
+
+    Args:
+        elem: xml.etree.ElementTree.Element of a track or album
+        libtype: str either track or album
+
+    Returns:
+        IndexEntry
+    """
+    attrib = elem.attrib
+    if libtype == "track":
+        album = attrib.get("parentTitle", "")
+        artist = attrib.get("originalTitle") or attrib.get("grandparentTitle", "")
+    else:
+        album = attrib.get("title", "")
+        artist = attrib.get("parentTitle", "")
+    return IndexEntry(
+        rating_key=int(attrib["ratingKey"]),
+        libtype=libtype,
+        title=attrib.get("title", ""),
+        album=album,
+        artist=artist,
+        thumb=attrib.get("thumb") or attrib.get("parentThumb"),
+        duration=int(attrib.get("duration", 0)),
+        updated_at=max(int(attrib.get("updatedAt", 0)), int(attrib.get("addedAt", 0))),
+    )
+
+
+def fetch_page(server, section_key, libtype: str, start: int, size: int, **filters):
+    """
+    Fetch one page of raw library items from Plex
+
+    Blocking, meant to be run through the PlexGateway.
+
+    Args:
+        server: plexapi.server.PlexServer connected server
+        section_key: str key of the music library section
+        libtype: str either track or album
+        start: int container offset
+        size: int container size
+        **filters: extra Plex filter query arguments, e.g. {"updatedAt>>": 0}
+
+    Returns:
+        List of IndexEntry
+    """
+    query = "&".join(f"{k}={v}" for k, v in filters.items())
+    key = f"/library/sections/{section_key}/all?type={LIBTYPES[libtype]}"
+    if query:
+        key = f"{key}&{query}"
+    headers = {"X-Plex-Container-Start": str(start), "X-Plex-Container-Size": str(size)}
+    data = server.query(key, headers=headers)
+    return [entry_from_element(elem, libtype) for elem in data]
+
+
+class LibraryIndex:
+    """
+    Fuzzy title index of tracks and albums
+
+    Candidates are gathered from a trigram inverted index using the
+    rarest trigrams of the query, then ranked with fuzzywuzzy (or
+    difflib when it is not installed) against title and artist.
+
+    Postings live in two layers: compact read-only arrays restored
+    from a snapshot, and sets holding changes made since. Keys in the
+    base layer may be stale, so candidates are always checked against
+    the live entries before scoring.
+    """
+
+    # Number of rarest query trigrams used to gather candidates
+    PROBE_GRAMS = 6
+    # Number of candidates scored per query
+    CANDIDATES = 32
+
+    def __init__(self, min_score: int = 80):
+        """
+        Creates an empty index
+
+        Args:
+            min_score: int 0-100 minimum match score to count as a hit
+
+        Returns:
+            None
+        """
+        self.min_score = min_score
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._base = {libtype: {} for libtype in LIBTYPES}
+        self._live = {libtype: {} for libtype in LIBTYPES}
+        self._exact = {libtype: {} for libtype in LIBTYPES}
+        self._dirty = set()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, entry: IndexEntry):
+        """
+        Insert or replace an entry
+
+        Args:
+            entry: IndexEntry to index
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if entry.rating_key in self._entries:
+                self._discard(entry.rating_key)
+            self._entries[entry.rating_key] = entry
+            self._dirty.add(entry.rating_key)
+            name = normalize(entry.title)
+            self._exact[entry.libtype].setdefault(name, set()).add(entry.rating_key)
+            live = self._live[entry.libtype]
+            for gram in trigrams(name):
+                live.setdefault(gram, set()).add(entry.rating_key)
+
+    def remove(self, rating_key: int):
+        """
+        Drop an entry if present
+
+        Args:
+            rating_key: int Plex ratingKey
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if rating_key in self._entries:
+                self._discard(rating_key)
+                self._dirty.add(rating_key)
+
+    def _discard(self, rating_key: int):
+        entry = self._entries.pop(rating_key)
+        name = normalize(entry.title)
+        exact = self._exact[entry.libtype]
+        exact[name].discard(rating_key)
+        if not exact[name]:
+            del exact[name]
+        live = self._live[entry.libtype]
+        for gram in trigrams(name):
+            keys = live.get(gram)
+            if keys is not None:
+                keys.discard(rating_key)
+
+    def get(self, rating_key: int):
+        """
+        Look up an entry by ratingKey
+
+        Args:
+            rating_key: int Plex ratingKey
+
+        Returns:
+            IndexEntry or None
+        """
+        return self._entries.get(rating_key)
+
+    @staticmethod
+    def _score(query: str, entry: IndexEntry) -> int:
+        title = normalize(entry.title)
+        with_artist = f"{title} {normalize(entry.artist)}"
+        if fuzz:
+            return max(fuzz.WRatio(query, title), fuzz.token_set_ratio(query, with_artist))
+        return int(
+            100
+            * max(
+                SequenceMatcher(None, query, title).ratio(),
+                SequenceMatcher(None, query, with_artist).ratio(),
+            )
+        )
+
+    def search(self, title: str, libtype: str = "track"):
+        """
+        Find the best matching entry for a title
+
+        Args:
+            title: str user supplied title
+            libtype: str either track or album
+
+        Returns:
+            IndexEntry of the best match, None if nothing scores high enough
+        """
+        query = normalize(title)
+        if not query:
+            return None
+
+        with self._lock:
+            exact = self._exact[libtype].get(query)
+            if exact:
+                return self._entries[min(exact)]
+
+            base, live = self._base[libtype], self._live[libtype]
+            grams = sorted(
+                (gram for gram in trigrams(query) if gram in base or gram in live),
+                key=lambda gram: len(base.get(gram, ())) + len(live.get(gram, ())),
+            )
+            hits = Counter()
+            for gram in grams[: self.PROBE_GRAMS]:
+                hits.update(base.get(gram, ()))
+                hits.update(live.get(gram, ()))
+            candidates = []
+            # Overscan a little, base postings may hold stale keys
+            for key, _ in hits.most_common(self.CANDIDATES * 4):
+                entry = self._entries.get(key)
+                if entry and entry.libtype == libtype:
+                    candidates.append(entry)
+                    if len(candidates) == self.CANDIDATES:
+                        break
+
+        best, best_score = None, self.min_score - 1
+        for entry in candidates:
+            score = self._score(query, entry)
+            if score > best_score:
+                best, best_score = entry, score
+        return best
+
+    def restore(self, entries, names, postings):
+        """
+        Bulk load a snapshot into an empty index
+
+        Args:
+            entries: list of IndexEntry
+            names: list of str normalized titles, parallel to entries
+            postings: dict of (libtype, gram) to array of ratingKeys
+
+        Returns:
+            None
+        """
+        with self._lock:
+            for entry, name in zip(entries, names):
+                self._entries[entry.rating_key] = entry
+                self._exact[entry.libtype].setdefault(name, set()).add(entry.rating_key)
+            for (libtype, gram), keys in postings.items():
+                self._base[libtype][gram] = keys
+
+    def drain(self):
+        """
+        Collect changes since the last call for persisting
+
+        Live postings are folded into the compact base arrays,
+        dropping keys of removed entries on the way.
+
+        Returns:
+            Tuple of list of IndexEntry to upsert, list of int
+            ratingKeys to delete and dict of (libtype, gram) to
+            array of changed postings.
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            upserts = [self._entries[key] for key in dirty if key in self._entries]
+            deletes = [key for key in dirty if key not in self._entries]
+            touched = [
+                (libtype, gram)
+                for libtype, live in self._live.items()
+                for gram in list(live)
+            ]
+
+        postings = {}
+        for libtype, gram in touched:
+            # Lock per gram so searches are never held up for long
+            with self._lock:
+                keys = set(self._base[libtype].get(gram, ()))
+                keys.update(self._live[libtype].pop(gram, ()))
+                merged = array("q", sorted(k for k in keys if k in self._entries))
+                self._base[libtype][gram] = merged
+            postings[(libtype, gram)] = merged
+        return upserts, deletes, postings
+
+    def undrain(self, upserts, deletes, postings):
+        """
+        Mark drained changes as unsaved again, after a failed save
+
+        Args:
+            upserts: list of IndexEntry returned by drain
+            deletes: list of int ratingKeys returned by drain
+            postings: dict of (libtype, gram) to array returned by drain
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._dirty.update(entry.rating_key for entry in upserts)
+            self._dirty.update(deletes)
+            # An empty live set makes the next drain write the gram again
+            for libtype, gram in postings:
+                self._live[libtype].setdefault(gram, set())
+
+
+class IndexSnapshot:
+    """
+    On-disk SQLite snapshot of a LibraryIndex
+
+    Stores entries, their normalized titles and the compact posting
+    arrays, so restoring is a couple of bulk reads rather than a
+    rebuild. Saving only writes what changed since the last save.
+    All methods block and are meant to be run in an executor.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+        CREATE TABLE IF NOT EXISTS entries (
+            rating_key INTEGER PRIMARY KEY, libtype TEXT, title TEXT,
+            album TEXT, artist TEXT, thumb TEXT, duration INTEGER,
+            updated_at INTEGER, name TEXT
+        );
+        CREATE TABLE IF NOT EXISTS postings (
+            libtype TEXT, gram TEXT, keys BLOB, PRIMARY KEY (libtype, gram)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: pathlib.Path of the snapshot database
+
+        Returns:
+            None
+        """
+        self.path = path
+
+    def _connect(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path))
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(self.SCHEMA)
+        return conn
+
+    def load(self, index: LibraryIndex) -> int:
+        """
+        Restore the snapshot into an empty index
+
+        Args:
+            index: LibraryIndex to fill
+
+        Returns:
+            int saved watermark, 0 if there was nothing to restore
+
+        Raises:
+            sqlite3.Error: Snapshot is unreadable
+            OSError: Cache dir can't be created
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'watermark'").fetchone()
+            if not row:
+                return 0
+            entries, names = [], []
+            for *fields, name in conn.execute("SELECT * FROM entries"):
+                entries.append(IndexEntry(*fields))
+                names.append(name)
+            postings = {}
+            for libtype, gram, blob in conn.execute("SELECT * FROM postings"):
+                keys = array("q")
+                keys.frombytes(blob)
+                postings[(libtype, gram)] = keys
+        finally:
+            conn.close()
+
+        index.restore(entries, names, postings)
+        return row[0]
+
+    def save(self, index: LibraryIndex, watermark: int):
+        """
+        Write changes made to the index since the last save
+
+        Changes are only marked saved once the write commits, a
+        failed save leaves them for the next one.
+
+        Args:
+            index: LibraryIndex to persist
+            watermark: int unix time of the newest change seen
+
+        Returns:
+            None
+
+        Raises:
+            sqlite3.Error: Snapshot can't be written
+            OSError: Cache dir can't be created
+        """
+        conn = self._connect()
+        upserts, deletes, postings = index.drain()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    ((*entry, normalize(entry.title)) for entry in upserts),
+                )
+                conn.executemany(
+                    "DELETE FROM entries WHERE rating_key = ?", ((key,) for key in deletes)
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO postings VALUES (?, ?, ?)",
+                    ((libtype, gram, keys.tobytes()) for (libtype, gram), keys in postings.items()),
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('watermark', ?)", (watermark,)
+                )
+        except sqlite3.Error:
+            index.undrain(upserts, deletes, postings)
+            raise
+        finally:
+            conn.close()
@@ -0,0 +1,175 @@
+"""Lyrics lookup and persistent lyrics cache."""
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+plex_log = logging.getLogger("Plex")
+
+# Plex stream type of lyrics, embedded or sidecar
+LYRICS_STREAM = "4"
+
+# Timestamps and tags of LRC formatted lyrics
+LRC_TAG = re.compile(r"^(\[[^\]]*\])+\s?")
+
+
+def strip_lrc(text: str) -> str:
+    """
+    Remove LRC timestamps and tags, leaving plain lyrics
+
+    Args:
+        text: str lyrics, LRC formatted or plain
+
+    Returns:
+        str plain lyrics
+    """
+    lines = (LRC_TAG.sub("", line) for line in text.splitlines())
+    return "\n".join(lines).strip()
+
+
+def plex_lyrics(server, session, rating_key: int, timeout: float = None):
+    """
+    Fetch lyrics Plex holds for a track
+
+    Blocking, meant to be run through the PlexGateway.
+
+    Args:
+        server: plexapi.server.PlexServer to query
+        session: requests.Session to download the stream with
+        rating_key: int ratingKey of the track
+        timeout: float seconds to wait for the download
+
+    Returns:
+        str lyrics, None if Plex has no lyrics stream for the track
+    """
+    data = server.query(f"/library/metadata/{rating_key}")
+    for stream in data.iter("Stream"):
+        if stream.attrib.get("streamType") != LYRICS_STREAM:
+            continue
+        key = stream.attrib.get("key")
+        if not key:
+            continue
+        resp = session.get(server.url(key, includeToken=True), timeout=timeout)
+        resp.raise_for_status()
+        text = strip_lrc(resp.content.decode("utf-8", errors="replace"))
+        if text:
+            return text
+    return None
+
+
+class LyricsCache:
+    """
+    Lyrics by Plex ratingKey, kept for a limited time
+
+    A small memory tier in front of an optional SQLite table, so
+    lyrics survive restarts. Songs without lyrics are cached too,
+    stored as an empty string, so they aren't searched again on
+    every request. All methods block and are meant to be run in
+    an executor.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS lyrics (
+            rating_key INTEGER PRIMARY KEY, text TEXT, fetched_at INTEGER
+        );
+    """
+
+    # Entries kept in memory, the rest is only on disk
+    MEMORY_ITEMS = 256
+
+    def __init__(self, path=None, ttl: int = 30 * 86400):
+        """
+        Args:
+            path: pathlib.Path of the cache database, None for memory only
+            ttl: int seconds lyrics are kept
+
+        Returns:
+            None
+        """
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._items = {}
+
+    def _connect(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path))
+        conn.executescript(self.SCHEMA)
+        return conn
+
+    def _remember(self, rating_key: int, item):
+        with self._lock:
+            self._items.pop(rating_key, None)
+            self._items[rating_key] = item
+            if len(self._items) > self.MEMORY_ITEMS:
+                # Dicts keep insertion order, drop the oldest
+                del self._items[next(iter(self._items))]
+
+    def get(self, rating_key: int):
+        """
+        Cached lyrics of a track
+
+        Args:
+            rating_key: int ratingKey of the track
+
+        Returns:
+            str lyrics, empty if the track has none, None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            item = self._items.get(rating_key)
+        if item and now - item[1] < self.ttl:
+            return item[0]
+
+        if not self.path:
+            return None
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT text, fetched_at FROM lyrics WHERE rating_key = ?",
+                    (rating_key,),
+                ).fetchone()
+            finally:
+                conn.close()
+        except (OSError, sqlite3.Error) as err:
+            plex_log.warning("Unable to read lyrics cache: %s", err)
+            return None
+        if not row or now - row[1] >= self.ttl:
+            return None
+        self._remember(rating_key, row)
+        return row[0]
+
+    def put(self, rating_key: int, text: str):
+        """
+        Remember the lyrics of a track
+
+        Args:
+            rating_key: int ratingKey of the track
+            text: str lyrics, empty if the track has none
+
+        Returns:
+            None
+        """
+        item = (text, int(time.time()))
+        self._remember(rating_key, item)
+        if not self.path:
+            return
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO lyrics VALUES (?, ?, ?)",
+                        (rating_key, *item),
+                    )
+                    # Expired rows are only dropped on writes
+                    conn.execute(
+                        "DELETE FROM lyrics WHERE fetched_at < ?",
+                        (item[1] - self.ttl,),
+                    )
+            finally:
+                conn.close()
+        except (OSError, sqlite3.Error) as err:
+            plex_log.warning("Unable to write lyrics cache: %s", err)
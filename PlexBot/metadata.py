@@ -0,0 +1,155 @@
+"""Batched lookups of Plex items by ratingKey."""
+import asyncio
+import logging
+
+from plexapi.exceptions import NotFound
+
+plex_log = logging.getLogger("Plex")
+
+
+class MetadataResolver:
+    """
+    Fetches full Plex items, many ratingKeys per request
+
+    Lookups requested during the same loop iteration are coalesced
+    into a single `/library/metadata/id1,id2,...` request, and large
+    batches are split into chunks fetched concurrently through the
+    PlexGateway. Callers that only need titles should read the
+    parentTitle and grandparentTitle fields they already hold
+    instead of asking for the parent items.
+    """
+
+    def __init__(self, server, gateway, batch_size: int = 50):
+        """
+        Initializes an empty batch
+
+        Args:
+            server: plexapi.server.PlexServer to query
+            gateway: PlexBot.gateway.PlexGateway to run requests through
+            batch_size: int maximum ratingKeys per request
+
+        Returns:
+            None
+
+        Raises:
+            None
+        """
+        self.server = server
+        self.gateway = gateway
+        self.batch_size = batch_size
+        self._pending = {}
+        self._flush_task = None
+
+        # Metrics
+        self.lookups = 0
+        self.requests = 0
+
+    def _fetch_batch(self, keys):
+        """
+        Fetch a single batch of items
+
+        Blocking, meant to be run through the PlexGateway.
+
+        Args:
+            keys: list of int ratingKeys
+
+        Returns:
+            Dict of int ratingKey to plexapi media object
+        """
+        ekey = "/library/metadata/" + ",".join(str(key) for key in keys)
+        try:
+            items = self.server.fetchItems(ekey)
+        except NotFound:
+            # Every key in the batch is gone
+            return {}
+        return {int(item.ratingKey): item for item in items}
+
+    async def fetch_many(self, keys):
+        """
+        Fetch many items at once
+
+        Args:
+            keys: iterable of int ratingKeys
+
+        Returns:
+            Dict of int ratingKey to plexapi media object, keys
+            no longer in Plex are left out.
+
+        Raises:
+            PlexTimeoutError: Plex did not answer in time
+        """
+        keys = list(dict.fromkeys(keys))
+        chunks = [
+            keys[i : i + self.batch_size] for i in range(0, len(keys), self.batch_size)
+        ]
+        self.lookups += len(keys)
+        self.requests += len(chunks)
+        results = await asyncio.gather(
+            *(self.gateway.run(self._fetch_batch, chunk) for chunk in chunks)
+        )
+        items = {}
+        for result in results:
+            items.update(result)
+        return items
+
+    async def fetch(self, key: int):
+        """
+        Fetch a single item, batched with concurrent lookups
+
+        Args:
+            key: int ratingKey
+
+        Returns:
+            plexapi media object
+
+        Raises:
+            NotFound: Item no longer exists in Plex
+            PlexTimeoutError: Plex did not answer in time
+        """
+        key = int(key)
+        future = self._pending.get(key)
+        if future is None:
+            future = asyncio.get_event_loop().create_future()
+            self._pending[key] = future
+            if self._flush_task is None:
+                self._flush_task = asyncio.ensure_future(self._flush())
+        # Shielded, one cancelled caller must not fail the others
+        item = await asyncio.shield(future)
+        if item is None:
+            raise NotFound(f"Item {key} not found")
+        return item
+
+    async def _flush(self):
+        """
+        Coroutine resolving every lookup gathered so far
+
+        Returns:
+            None
+
+        Raises:
+            None
+        """
+        # Let every lookup of this loop iteration join the batch
+        await asyncio.sleep(0)
+        pending, self._pending = self._pending, {}
+        self._flush_task = None
+        try:
+            items = await self.fetch_many(pending)
+        except Exception as err:  # pylint: disable=broad-except
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(err)
+            return
+        for key, future in pending.items():
+            if not future.done():
+                future.set_result(items.get(key))
+        plex_log.debug("Resolved %s items in one batch", len(pending))
+
+    def stats(self):
+        """
+        Snapshot of resolver metrics
+
+        Returns:
+            Dict of lookup and request counters.
+        """
+        return {"lookups": self.lookups, "requests": self.requests}
@@ -0,0 +1,340 @@
+"""Process wide metrics with a Prometheus text exposition."""
+import asyncio
+import functools
+import logging
+import threading
+import time
+import weakref
+from bisect import bisect_left
+
+bot_log = logging.getLogger("Bot")
+
+# Latency buckets in seconds, from a cache hit to a Plex timeout
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs.extend(f'{n}="{_escape(v)}"' for n, v in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """
+    Base of all metric types
+
+    Values are kept per label combination, all updates take a
+    lock so they can be made from worker threads too.
+    """
+
+    kind = None
+
+    def __init__(self, name: str, doc: str, labels=()):
+        self.name = name
+        self.doc = doc
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def samples(self):
+        """
+        Returns:
+            List of tuples of sample name suffix, label values,
+            extra labels and value.
+        """
+        with self._lock:
+            return [("", key, (), value) for key, value in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(
+                f"{self.name}{suffix}{_labels(self.label_names, key, extra)} {value}"
+            )
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Counter):
+    """Value going up and down, like work in flight."""
+
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class _Timer:
+    """Context manager and decorator observing elapsed time."""
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Timer(self.histogram, self.labels):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+
+class Histogram(_Metric):
+    """Distribution of durations over fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labels=(), buckets=BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Bucket counts, then sum and count
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[bisect_left(self.buckets, value)] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def time(self, **labels):
+        """
+        Time a block or function into this histogram
+
+        Args:
+            **labels: label values of the observation
+
+        Returns:
+            Context manager, also usable as a decorator
+        """
+        return _Timer(self, labels)
+
+    def summary(self, **labels):
+        """
+        Returns:
+            Tuple of int count and float mean, for the stats command
+        """
+        with self._lock:
+            state = self._values.get(self._key(labels))
+        if not state or not state[-1]:
+            return 0, 0.0
+        return state[-1], state[-2] / state[-1]
+
+    def keys(self):
+        with self._lock:
+            return [dict(zip(self.label_names, key)) for key in self._values]
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        for key, state in items:
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), state):
+                total += count
+                samples.append(("_bucket", key, (("le", bound),), total))
+            samples.append(("_sum", key, (), state[-2]))
+            samples.append(("_count", key, (), state[-1]))
+        return samples
+
+
+class Registry:
+    """
+    Collection of metrics rendered together
+
+    Collectors are callables run at render time returning
+    dicts of gauge name to value, used to expose figures other
+    components already keep, like the PlexGateway stats.
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name: str, doc: str, labels=()) -> Counter:
+        metric = Counter(name, doc, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, doc: str, labels=()) -> Gauge:
+        metric = Gauge(name, doc, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, doc: str, labels=()) -> Histogram:
+        metric = Histogram(name, doc, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        Returns:
+            str Prometheus text exposition of every metric
+        """
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            try:
+                values = collector()
+            except Exception as err:  # pylint: disable=broad-except
+                bot_log.debug("Metrics collector failed - %s", err)
+                continue
+            for name, value in values.items():
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+COMMANDS = REGISTRY.counter(
+    "plexbot_commands_total", "Commands invoked.", ["command", "status"]
+)
+COMMAND_SECONDS = REGISTRY.histogram(
+    "plexbot_command_seconds", "Command latency.", ["command"]
+)
+COMMANDS_IN_FLIGHT = REGISTRY.gauge(
+    "plexbot_commands_in_flight", "Commands running.", ["command"]
+)
+PLEX_CALLS = REGISTRY.counter(
+    "plexbot_plex_calls_total", "Plex requests made.", ["call", "status"]
+)
+PLEX_SECONDS = REGISTRY.histogram(
+    "plexbot_plex_call_seconds", "Plex request latency, queueing included.", ["call"]
+)
+PLEX_IN_FLIGHT = REGISTRY.gauge(
+    "plexbot_plex_calls_in_flight", "Plex requests queued or running."
+)
+EMBED_SECONDS = REGISTRY.histogram(
+    "plexbot_embed_build_seconds", "Embed card build time, art included.", ["type"]
+)
+ART_SECONDS = REGISTRY.histogram(
+    "plexbot_art_fetch_seconds", "Art downloads on thumbnail cache misses."
+)
+SOURCE_SECONDS = REGISTRY.histogram(
+    "plexbot_audio_source_seconds", "Audio source creation, FFmpeg spawn included."
+)
+SEND_SECONDS = REGISTRY.histogram(
+    "plexbot_discord_send_seconds", "Discord message sends by the player.", ["kind"]
+)
+OUTBOX_MERGED = REGISTRY.counter(
+    "plexbot_outbox_merged_total", "Text messages merged into an earlier one."
+)
+OUTBOX_DROPPED = REGISTRY.counter(
+    "plexbot_outbox_dropped_total", "Waiting messages superseded by a newer one."
+)
+LOOP_LAG = REGISTRY.histogram(
+    "plexbot_loop_lag_seconds", "Event loop scheduling lag."
+)
+LOOP_STALLS = REGISTRY.counter(
+    "plexbot_loop_stalls_total", "Event loop stalls by running command.", ["command"]
+)
+
+# Name of the command each task is running, for stall attribution
+ACTIVE_COMMANDS = weakref.WeakKeyDictionary()
+
+
+def command_started(ctx):
+    """
+    Hook run before every command
+
+    Args:
+        ctx: discord.ext.commands.Context of the command
+
+    Returns:
+        None
+    """
+    ctx.metrics_start = time.perf_counter()
+    COMMANDS_IN_FLIGHT.inc(command=ctx.command.qualified_name)
+    task = asyncio.current_task()
+    if task:
+        ACTIVE_COMMANDS[task] = ctx.command.qualified_name
+
+
+def command_finished(ctx):
+    """
+    Hook run after every command, failed or not
+
+    Args:
+        ctx: discord.ext.commands.Context of the command
+
+    Returns:
+        None
+    """
+    name = ctx.command.qualified_name
+    start = getattr(ctx, "metrics_start", None)
+    if start is None:
+        return
+    task = asyncio.current_task()
+    if task:
+        ACTIVE_COMMANDS.pop(task, None)
+    COMMANDS_IN_FLIGHT.dec(command=name)
+    COMMAND_SECONDS.observe(time.perf_counter() - start, command=name)
+    COMMANDS.inc(command=name, status="error" if ctx.command_failed else "ok")
+
+
+async def start_server(host: str, port: int):
+    """
+    Serve REGISTRY on http://host:port/metrics
+
+    Args:
+        host: str address to bind
+        port: int port to bind
+
+    Returns:
+        aiohttp.web.AppRunner of the server, cleanup() stops it
+    """
+    from aiohttp import web
+
+    async def handle(_request):
+        return web.Response(
+            text=REGISTRY.render(), content_type="text/plain", charset="utf-8"
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    bot_log.info("Serving metrics on http://%s:%s/metrics", host, port)
+    return runner
@@ -0,0 +1,222 @@
+"""Paced and coalesced outbound messages, one queue per channel."""
+import asyncio
+import logging
+import time
+from collections import deque
+
+from . import metrics
+
+bot_log = logging.getLogger("Bot")
+
+# Discord message length limit
+MAX_CONTENT = 2000
+
+
+class _Pending:
+    """Message waiting in a channel queue, with everyone awaiting it."""
+
+    __slots__ = ("content", "embed", "file", "delete_after", "key", "futures")
+
+    def __init__(self, content, embed, file, delete_after, key, future):
+        self.content = content
+        self.embed = embed
+        self.file = file
+        self.delete_after = delete_after
+        self.key = key
+        self.futures = [future]
+
+    @property
+    def text_only(self) -> bool:
+        return self.embed is None and self.file is None and self.key is None
+
+    @property
+    def wanted(self) -> bool:
+        return any(not fut.done() for fut in self.futures)
+
+
+class ChannelOutbox:
+    """
+    Outbound queue of a single text channel
+
+    Messages go out in order from one worker, paced to stay
+    within the per channel bucket discord enforces, instead of
+    being fired at once and throttled one by one. Adjacent text
+    messages are merged while they fit in one message, and a
+    keyed message replaces one with the same key still waiting,
+    so a burst of now playing cards only sends the latest.
+
+    discord.py 1.4 sends a single embed per message, so embeds
+    are paced but never merged.
+
+    Args:
+        channel: discord.abc.Messageable to send to
+        rate: int messages allowed per period
+        per: float seconds of the rate limit period
+    """
+
+    def __init__(self, channel, rate: int = 5, per: float = 5.0):
+        self.channel = channel
+        self.rate = rate
+        self.per = per
+        self.pending = deque()
+        self.sent = deque(maxlen=rate)
+        self.task = None
+
+    def send(self, content=None, *, embed=None, file=None, delete_after=None, key=None):
+        """
+        Queue a message
+
+        Args:
+            content: str text of the message
+            embed: discord.Embed of the message
+            file: discord.File attached to the message
+            delete_after: float seconds before the message is deleted
+            key: hashable, a waiting message with the same key is dropped
+
+        Returns:
+            asyncio.Future resolving to the sent discord.Message
+        """
+        loop = asyncio.get_event_loop()
+        fut = loop.create_future()
+        item = _Pending(content, embed, file, delete_after, key, fut)
+        if key is not None:
+            for old in [p for p in self.pending if p.key == key]:
+                self.pending.remove(old)
+                item.futures.extend(old.futures)
+                metrics.OUTBOX_DROPPED.inc()
+        self.pending.append(item)
+        if self.task is None or self.task.done():
+            self.task = loop.create_task(self._worker())
+        return fut
+
+    def _next_batch(self):
+        """
+        Pop the next message, merging the text messages after it
+
+        Returns:
+            _Pending to send
+        """
+        item = self.pending.popleft()
+        if not item.text_only or item.content is None:
+            return item
+        content = item.content
+        while self.pending:
+            nxt = self.pending[0]
+            if not nxt.wanted:
+                self.pending.popleft()
+                continue
+            if (
+                not nxt.text_only
+                or nxt.content is None
+                or nxt.delete_after != item.delete_after
+                or len(content) + 1 + len(nxt.content) > MAX_CONTENT
+            ):
+                break
+            self.pending.popleft()
+            content += "\n" + nxt.content
+            item.futures.extend(nxt.futures)
+            metrics.OUTBOX_MERGED.inc()
+        item.content = content
+        return item
+
+    async def _pace(self):
+        """
+        Wait until the channel bucket has room for another message
+
+        Returns:
+            None
+        """
+        if len(self.sent) == self.rate:
+            wait = self.sent[0] + self.per - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+    async def _worker(self):
+        """
+        Send queued messages until none are left
+
+        Returns:
+            None
+        """
+        while self.pending:
+            await self._pace()
+            if not self.pending:
+                break
+            item = self._next_batch()
+            if not item.wanted:
+                continue
+            try:
+                with metrics.SEND_SECONDS.time(kind="outbox"):
+                    msg = await self.channel.send(
+                        item.content,
+                        embed=item.embed,
+                        file=item.file,
+                        delete_after=item.delete_after,
+                    )
+            except asyncio.CancelledError:
+                for fut in item.futures:
+                    fut.cancel()
+                raise
+            except Exception as err:  # pylint: disable=broad-except
+                # Fail just this message, the rest of the queue still goes out
+                bot_log.debug("Outbound message failed - %s", err)
+                for fut in item.futures:
+                    if not fut.done():
+                        fut.set_exception(err)
+                continue
+            finally:
+                self.sent.append(time.monotonic())
+            for fut in item.futures:
+                if not fut.done():
+                    fut.set_result(msg)
+
+
+class Outbox:
+    """
+    Channel outboxes of the whole bot
+
+    Args:
+        rate: int messages allowed per period and channel
+        per: float seconds of the rate limit period
+    """
+
+    def __init__(self, rate: int = 5, per: float = 5.0):
+        self.rate = rate
+        self.per = per
+        self.channels = {}
+
+    def channel(self, channel) -> ChannelOutbox:
+        """
+        Outbox of a channel, created on first use
+
+        Args:
+            channel: discord.abc.Messageable, usually ctx.channel
+
+        Returns:
+            ChannelOutbox of the channel
+        """
+        outbox = self.channels.get(channel.id)
+        if outbox is None:
+            outbox = self.channels[channel.id] = ChannelOutbox(
+                channel, self.rate, self.per
+            )
+        return outbox
+
+    def send(self, channel, content=None, **kwargs):
+        """
+        Queue a message to a channel, see ChannelOutbox.send
+
+        Returns:
+            asyncio.Future resolving to the sent discord.Message
+        """
+        return self.channel(channel).send(content, **kwargs)
+
+    def stats(self):
+        """
+        Returns:
+            Dict of channels tracked and messages waiting
+        """
+        return {
+            "channels": len(self.channels),
+            "pending": sum(len(o.pending) for o in self.channels.values()),
+        }
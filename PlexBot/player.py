@@ -0,0 +1,494 @@
+"""Per guild playback state and player loop."""
+import asyncio
+import logging
+import time
+from collections import namedtuple
+
+import discord
+from async_timeout import timeout
+from plexapi.exceptions import NotFound
+
+from .exceptions import PlexTimeoutError
+from .exceptions import VoiceChannelError
+from .playqueue import PlayQueue
+
+bot_log = logging.getLogger("Bot")
+plex_log = logging.getLogger("Plex")
+
+# Player states
+IDLE = "idle"
+PLAYING = "playing"
+
+# Look-ahead work done for the next track
+Prepared = namedtuple("Prepared", ["entry", "track", "card", "source", "url"])
+
+
+class GuildPlayer:
+    """
+    Playback state of a single guild
+
+    Owns the guild's queue, voice client and player task, so
+    several guilds can use the bot at the same time without
+    interfering. Created lazily by the Plex cog and reaped once
+    it has been idle for longer than the idle timeout.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    # All are necessary to detect global interactions
+    # within the guild.
+
+    def __init__(self, cog, guild_id: int, idle_timeout: int = 15):
+        """
+        Initializes empty playback state and starts the player task
+
+        Args:
+            cog: PlexBot.bot.Plex owning cog
+            guild_id: int id of the guild this player serves
+            idle_timeout: int seconds idle before disconnecting
+
+        Returns:
+            None
+
+        Raises:
+            None
+        """
+        self.cog = cog
+        self.guild_id = guild_id
+        self.idle_timeout = idle_timeout
+
+        self.state = IDLE
+        self.voice_channel = None
+        self.current_entry = None
+        self.current_track = None
+        self.is_looping = False
+        self.loop_queue = None
+        self.np_message_id = None
+        self.queue_message = None
+        self.queue_view_task = None
+        self.ctx = None
+        self.started_at = None
+
+        # Look-ahead state for the next track
+        self.prepared = None
+        self._prefetch_task = None
+
+        # Background tasks still paging in albums and playlists
+        self.fills = set()
+
+        # Initialize events
+        self.play_queue = PlayQueue()
+        self.play_next_event = asyncio.Event()
+        self.voice_ready = asyncio.Event()
+
+        self.task = cog.bot.loop.create_task(self._audio_player_task())
+        cog.watchdog.start()
+
+    async def connect(self, ctx):
+        """
+        Ensures user is in a vc and joins it
+
+        Args:
+            ctx: discord.ext.commands.Context message context from command
+
+        Returns:
+            None
+
+        Raises:
+            VoiceChannelError: Author not in voice channel
+        """
+        # Fail if user not in vc
+        if not ctx.author.voice:
+            await ctx.send("Join a voice channel first!")
+            bot_log.debug("Failed to play, requester not in voice channel")
+            raise VoiceChannelError
+
+        # Connect to voice if not already
+        if not self.voice_channel:
+            try:
+                self.voice_channel = await ctx.author.voice.channel.connect()
+                self.voice_ready.set()
+                bot_log.debug("Connected to vc.")
+            except asyncio.TimeoutError:
+                bot_log.debug("Cannot connect to vc - timeout")
+
+    async def enqueue(self, entry):
+        """
+        Add a track to the end of the play queue
+
+        Args:
+            entry: PlexBot.playqueue.QueueEntry to queue
+
+        Returns:
+            None
+        """
+        await self.play_queue.put(entry)
+        if self.state == PLAYING and self.prepared is None:
+            self._schedule_prefetch()
+
+    def enqueue_many(self, entries, span=None):
+        """
+        Add several tracks to the play queue
+
+        Args:
+            entries: list of PlexBot.playqueue.QueueEntry to queue
+            span: PlexBot.playqueue.ShuffleSpan to scatter them
+                  over instead of appending
+
+        Returns:
+            None
+        """
+        if span:
+            for entry in entries:
+                span.insert(entry)
+            self.queue_changed()
+        else:
+            self.play_queue.extend(entries)
+            if self.state == PLAYING and self.prepared is None:
+                self._schedule_prefetch()
+
+    def add_fill(self, task):
+        """
+        Track a background task filling the queue
+
+        Args:
+            task: asyncio.Task paging in tracks
+
+        Returns:
+            None
+        """
+        self.fills.add(task)
+        task.add_done_callback(self.fills.discard)
+
+    def cancel_fills(self):
+        """
+        Stop every background task still filling the queue
+
+        Returns:
+            None
+        """
+        for task in list(self.fills):
+            task.cancel()
+
+    def queue_changed(self):
+        """
+        Notify the player that the head of the queue may have changed
+
+        Re-targets the look-ahead at whatever is up next now.
+
+        Returns:
+            None
+        """
+        if self.state == PLAYING:
+            self._schedule_prefetch()
+
+    def _peek(self):
+        """
+        Next entry the player will take, without taking it
+
+        Returns:
+            PlexBot.playqueue.QueueEntry or None if nothing is queued
+        """
+        if self.is_looping:
+            return self.is_looping
+        return self.play_queue.peek()
+
+    def _schedule_prefetch(self):
+        # Keep work already done if it is still for the next entry
+        self.prepared = self._take_prepared(self._peek())
+        self._prefetch_task = self.cog.bot.loop.create_task(self._prefetch())
+
+    async def _prefetch(self):
+        """
+        Prepare the next queued track while the current one plays
+
+        Fetches the full track and builds its `now playing` card
+        right away. Shortly before the current track ends, the
+        audio source is created too, so FFmpeg has connected to
+        Plex and filled its buffer by the time it is needed.
+        Spawning it any earlier would leave an idle stream open
+        long enough for Plex to drop it.
+
+        Returns:
+            None
+        """
+        entry = self._peek()
+        if entry is None:
+            return
+
+        prepared = self.prepared
+        if prepared is None:
+            try:
+                track = await self._hydrate(entry)
+                card = await self.cog.gateway.run(self.cog._build_embed_track, entry)
+            except PlexTimeoutError:
+                return
+            if track is None:
+                return
+            prepared = self.prepared = Prepared(entry, track, card, None, None)
+            self.cog.prefetch_lyrics(entry)
+
+        lead = self.cog.prefetch_lead
+        if prepared.source or not lead or not self.current_entry:
+            return
+        remaining = self.current_entry.duration / 1000
+        remaining -= time.monotonic() - self.started_at
+        await asyncio.sleep(max(0, remaining - lead))
+
+        if self._peek() is not entry or self.prepared is not prepared:
+            return
+        source, url = self.cog._audio_source(prepared.track)
+        self.prepared = prepared._replace(source=source, url=url)
+        bot_log.debug("Pre-warmed stream of %s", entry)
+
+    async def _hydrate(self, entry):
+        """
+        Fetch the full plexapi track behind a queue entry
+
+        Args:
+            entry: PlexBot.playqueue.QueueEntry
+
+        Returns:
+            plexapi.audio.Track, None if it is gone from Plex
+
+        Raises:
+            PlexTimeoutError: Plex did not answer in time
+        """
+        try:
+            return await self.cog.resolver.fetch(entry.rating_key)
+        except NotFound:
+            plex_log.info("%s no longer exists, skipping", entry)
+            if self.cog.index:
+                self.cog.index.remove(entry.rating_key)
+            return None
+
+    def _take_prepared(self, entry):
+        """
+        Claim the look-ahead work if it was done for this entry
+
+        Stale preparations are dropped, killing any FFmpeg
+        process spawned for them.
+
+        Args:
+            entry: PlexBot.playqueue.QueueEntry about to play
+
+        Returns:
+            Prepared or None
+        """
+        if self._prefetch_task and not self._prefetch_task.done():
+            self._prefetch_task.cancel()
+        prepared, self.prepared = self.prepared, None
+        if prepared and prepared.entry is not entry:
+            if prepared.source:
+                prepared.source.cleanup()
+            return None
+        return prepared
+
+    async def disconnect(self):
+        """
+        Stops playback and leaves the vc
+
+        The queue is kept, the player task waits for the
+        next connect before taking from it again.
+
+        Returns:
+            None
+        """
+        self.voice_ready.clear()
+        if self.voice_channel:
+            self.voice_channel.stop()
+            await self.voice_channel.disconnect()
+            self.voice_channel = None
+        # Kill any pre-warmed stream and pending fills
+        self._take_prepared(None)
+        self.cancel_fills()
+        self.ctx = None
+
+    async def _next_track(self):
+        """
+        Wait for the next entry to play
+
+        Replays the looped entry, refills from the loop
+        queue once the play queue has run dry.
+
+        Returns:
+            PlexBot.playqueue.QueueEntry to play next
+        """
+        if self.is_looping:
+            return self.is_looping
+
+        if self.play_queue.empty() and self.loop_queue:
+            bot_log.debug("swapping loop queue and play queue")
+            self.play_queue.extend(self.loop_queue)
+
+        return await self.play_queue.get()
+
+    def _play(self, track, prepared=None):
+        """
+        Heavy lifting of playing songs
+
+        Grabs the appropiate audio source, pre-warmed if available,
+        and initiates playback in the vc. The end of the track is
+        signalled through the after callback, never by polling the
+        voice client.
+
+        Args:
+            track: plexapi.audio.Track to play
+            prepared: Prepared look-ahead work for this track
+
+        Returns:
+            bool whether playback started
+        """
+        if not self.voice_channel or not self.voice_channel.is_connected():
+            if prepared and prepared.source:
+                prepared.source.cleanup()
+            return False
+
+        if prepared and prepared.source:
+            audio_stream, track_url = prepared.source, prepared.url
+        else:
+            audio_stream, track_url = self.cog._audio_source(track)
+        try:
+            self.voice_channel.play(audio_stream, after=self._toggle_next)
+        except discord.ClientException as err:
+            bot_log.debug("Unable to play %s - %s", track, err)
+            audio_stream.cleanup()
+            return False
+
+        plex_log.debug("%s - URL: %s", track, track_url)
+        return True
+
+    async def _send_now_playing(self, entry, card=None):
+        """
+        Post the `now playing` card of a track
+
+        Runs beside playback so a slow card never delays the audio.
+
+        Args:
+            entry: PlexBot.playqueue.QueueEntry now playing
+            card: tuple of prebuilt embed and art, if prefetched
+
+        Returns:
+            None
+        """
+        if card:
+            embed, img = card
+        else:
+            try:
+                embed, img = await self.cog.gateway.run(
+                    self.cog._build_embed_track, entry
+                )
+            except PlexTimeoutError:
+                bot_log.debug("Timed out building np card")
+                return
+        if self.ctx:
+            # Keyed, so a card still waiting for the rate limit is replaced
+            self.np_message_id = await self.cog.outbox.send(
+                self.ctx.channel, embed=embed, file=img, key="now_playing"
+            )
+
+    async def _clear_now_playing(self, np_task):
+        """
+        Remove the `now playing` card of the finished track
+
+        Args:
+            np_task: asyncio.Task which posted the card
+
+        Returns:
+            None
+        """
+        if not np_task.done():
+            np_task.cancel()
+        if self.np_message_id:
+            try:
+                await self.np_message_id.delete()
+            except discord.errors.NotFound:
+                pass
+            self.np_message_id = None
+
+    async def _audio_player_task(self):
+        """
+        Coroutine to handle playback and queuing
+
+        State machine with two states: idle, waiting on the play
+        queue, and playing, waiting on the after callback of the
+        voice client. Transitions are driven purely by those two
+        events, so the next track starts as soon as the last ends.
+        Nothing is taken from the queue while not connected to
+        voice. Disconnects from VC and reaps the player if idle
+        for longer than the idle timeout.
+        Handles auto deletion of now playing song notifications.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+        """
+        while True:
+            self.state = IDLE
+            try:
+                async with timeout(self.idle_timeout):
+                    await self.voice_ready.wait()
+                    entry = await self._next_track()
+            except asyncio.TimeoutError:
+                bot_log.debug("timeout - disconnecting")
+                await self.disconnect()
+                self.cog._reap_player(self)
+                return
+
+            self.play_next_event.clear()
+            prepared = self._take_prepared(entry)
+            if prepared:
+                track = prepared.track
+            else:
+                try:
+                    track = await self._hydrate(entry)
+                except PlexTimeoutError:
+                    track = None
+            if not track:
+                # Gone from Plex or Plex too slow, drop the track
+                continue
+            if not self._play(track, prepared):
+                if not self.voice_channel or not self.voice_channel.is_connected():
+                    # Voice went away, keep the track for the next connect
+                    self.voice_channel = None
+                    self.voice_ready.clear()
+                    if entry is not self.is_looping:
+                        self.play_queue.insert(0, entry)
+                continue
+
+            self.state = PLAYING
+            self.current_entry = entry
+            self.current_track = track
+            self.started_at = time.monotonic()
+            np_task = self.cog.bot.loop.create_task(
+                self._send_now_playing(entry, prepared.card if prepared else None)
+            )
+            self._schedule_prefetch()
+            await self.play_next_event.wait()
+            self.current_entry = None
+            self.current_track = None
+            await self._clear_now_playing(np_task)
+
+    def _toggle_next(self, error=None):
+        """
+        Callback for vc playback
+
+        Runs in the voice thread when a track ends or is stopped,
+        wakes _audio_player_task to play next in queue or idle.
+
+        Args:
+            error: Optional parameter required for discord.py callback
+
+        Returns:
+            None
+
+        Raises:
+            None
+        """
+        if error:
+            bot_log.error("Playback error: %s", error)
+        self.cog.bot.loop.call_soon_threadsafe(self.play_next_event.set)
@@ -0,0 +1,424 @@
+"""Play queue building blocks."""
+import asyncio
+import random
+import weakref
+from collections import deque
+from itertools import islice
+
+
+class QueueEntry:
+    """
+    Slim stand-in for a queued track
+
+    Holds just what queue views and cards need. Queued tracks no
+    longer keep whole plexapi objects, with their XML backed
+    attributes, alive. The full Track is fetched again by
+    ratingKey right before it plays.
+    """
+
+    __slots__ = ("rating_key", "title", "album", "artist", "duration", "thumb")
+
+    def __init__(self, rating_key, title, album, artist, duration, thumb):
+        """
+        Args:
+            rating_key: int Plex ratingKey of the track
+            title: str track title
+            album: str album title
+            artist: str artist name
+            duration: int length in milliseconds
+            thumb: str Plex thumb path of the art, may be None
+
+        Returns:
+            None
+        """
+        self.rating_key = rating_key
+        self.title = title
+        self.album = album
+        self.artist = artist
+        self.duration = duration
+        self.thumb = thumb
+
+    @classmethod
+    def from_track(cls, track):
+        """
+        Build an entry from a plexapi track
+
+        Uses only attributes the track already carries,
+        so no requests are made.
+
+        Args:
+            track: plexapi.audio.Track
+
+        Returns:
+            QueueEntry
+        """
+        return cls(
+            int(track.ratingKey),
+            track.title,
+            track.parentTitle or "",
+            track.originalTitle or track.grandparentTitle or "",
+            track.duration or 0,
+            track.parentThumb or track.thumb,
+        )
+
+    @classmethod
+    def from_element(cls, elem):
+        """
+        Build an entry from a raw Plex XML track element
+
+        Lets bulk listings skip building plexapi objects entirely.
+
+        Args:
+            elem: xml.etree.ElementTree.Element of a track
+
+        Returns:
+            QueueEntry
+        """
+        attrib = elem.attrib
+        return cls(
+            int(attrib["ratingKey"]),
+            attrib.get("title", ""),
+            attrib.get("parentTitle", ""),
+            attrib.get("originalTitle") or attrib.get("grandparentTitle", ""),
+            int(attrib.get("duration", 0)),
+            attrib.get("parentThumb") or attrib.get("thumb"),
+        )
+
+    @classmethod
+    def from_index(cls, entry):
+        """
+        Build an entry from a library index entry
+
+        Args:
+            entry: PlexBot.index.IndexEntry of a track
+
+        Returns:
+            QueueEntry
+        """
+        return cls(
+            entry.rating_key,
+            entry.title,
+            entry.album,
+            entry.artist,
+            entry.duration,
+            entry.thumb,
+        )
+
+    def __repr__(self):
+        return f"<QueueEntry:{self.rating_key}:{self.title}>"
+
+
+class PlayQueue:
+    """
+    Indexable play queue
+
+    A deque with an awaitable get, so the player can wait for
+    work while commands skip, insert, remove, move and shuffle
+    in place. No operation awaits, so each is atomic on the
+    event loop, and waiters are woken through an event rather
+    than holding the deque, so replacing it never orphans them.
+
+    Adding to the end and taking from the front are O(1).
+    Positional insert, remove and move are O(n) in the distance
+    from either end, skip is O(min(count, n - count)) and shuffle
+    copies the whole queue. Queues hold at most a few thousand
+    entries, where a middle insert is a couple of microseconds.
+    """
+
+    def __init__(self):
+        self._items = deque()
+        self._not_empty = asyncio.Event()
+        # Shuffled listings still filling in, kept in step with every change
+        self._spans = weakref.WeakSet()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        # Iterate over a copy, so awaiting while iterating is safe
+        return iter(list(self._items))
+
+    def __getitem__(self, index: int):
+        return self._items[index]
+
+    def empty(self) -> bool:
+        """
+        Returns:
+            bool whether nothing is queued
+        """
+        return not self._items
+
+    def qsize(self) -> int:
+        """
+        Returns:
+            int number of queued entries
+        """
+        return len(self._items)
+
+    def _shifted(self, index: int, delta: int, owner=None):
+        for span in self._spans:
+            if span is not owner:
+                span.shift(index, delta)
+
+    def _changed(self):
+        if self._items:
+            self._not_empty.set()
+        else:
+            self._not_empty.clear()
+
+    def put_nowait(self, entry):
+        """
+        Add an entry to the end of the queue
+
+        Args:
+            entry: QueueEntry to add
+
+        Returns:
+            None
+        """
+        self._items.append(entry)
+        self._changed()
+
+    async def put(self, entry):
+        """
+        Add an entry to the end of the queue
+
+        Args:
+            entry: QueueEntry to add
+
+        Returns:
+            None
+        """
+        self.put_nowait(entry)
+
+    def extend(self, entries):
+        """
+        Add several entries to the end of the queue
+
+        Args:
+            entries: iterable of QueueEntry
+
+        Returns:
+            None
+        """
+        self._items.extend(entries)
+        self._changed()
+
+    def insert(self, index: int, entry, span=None):
+        """
+        Add an entry at a position, 0 being up next
+
+        Args:
+            index: int position to insert at
+            entry: QueueEntry to add
+            span: ShuffleSpan the entry joins, if inserted by one
+
+        Returns:
+            None
+        """
+        index = max(0, min(index, len(self._items)))
+        self._items.insert(index, entry)
+        self._shifted(index, 1, span)
+        self._changed()
+
+    def get_nowait(self):
+        """
+        Take the entry which is up next
+
+        Returns:
+            QueueEntry
+
+        Raises:
+            IndexError: Queue is empty
+        """
+        entry = self._items.popleft()
+        self._shifted(0, -1)
+        self._changed()
+        return entry
+
+    async def get(self):
+        """
+        Take the entry which is up next, waiting for one if empty
+
+        Returns:
+            QueueEntry
+        """
+        while not self._items:
+            await self._not_empty.wait()
+        return self.get_nowait()
+
+    def peek(self):
+        """
+        Returns:
+            QueueEntry which is up next, None if the queue is empty
+        """
+        return self._items[0] if self._items else None
+
+    def skip(self, count: int) -> int:
+        """
+        Drop entries from the front of the queue
+
+        Args:
+            count: int number of entries to drop
+
+        Returns:
+            int number of entries actually dropped
+        """
+        count = max(0, min(count, len(self._items)))
+        if count * 2 > len(self._items):
+            # Cheaper to copy the remainder than to pop the head
+            self._items = deque(islice(self._items, count, None))
+        else:
+            for _ in range(count):
+                self._items.popleft()
+        for span in self._spans:
+            span.drop_front(count)
+        self._changed()
+        return count
+
+    def remove(self, index: int):
+        """
+        Remove the entry at a position
+
+        Args:
+            index: int position of the entry
+
+        Returns:
+            QueueEntry removed
+
+        Raises:
+            IndexError: No entry at that position
+        """
+        entry = self._items[index]
+        del self._items[index]
+        self._shifted(index % (len(self._items) + 1), -1)
+        self._changed()
+        return entry
+
+    def move(self, src: int, dst: int):
+        """
+        Move an entry to another position
+
+        Args:
+            src: int current position of the entry
+            dst: int new position of the entry
+
+        Returns:
+            QueueEntry moved
+
+        Raises:
+            IndexError: No entry at src
+        """
+        entry = self.remove(src)
+        self.insert(dst, entry)
+        return entry
+
+    def shuffle(self):
+        """
+        Shuffle the queue in place
+
+        Returns:
+            None
+        """
+        items = list(self._items)
+        random.shuffle(items)
+        self._items.clear()
+        self._items.extend(items)
+        # Listings still filling in now mix with the whole queue
+        for span in self._spans:
+            span.start, span.count = 0, len(items)
+
+    def clear(self):
+        """
+        Drop every entry, waiting getters keep waiting
+
+        Returns:
+            None
+        """
+        self._items.clear()
+        for span in self._spans:
+            span.start = span.count = 0
+        self._changed()
+
+    def slice(self, start: int, stop: int):
+        """
+        Copy of a range of entries
+
+        Args:
+            start: int first position
+            stop: int position after the last one
+
+        Returns:
+            List of QueueEntry
+        """
+        return list(islice(self._items, start, stop))
+
+
+class ShuffleSpan:
+    """
+    Part of a queue a shuffled listing is scattered over
+
+    Starts at the end of the queue when the listing starts
+    queueing, and grows with every entry inserted. The queue
+    moves the span along with every insert and removal, so
+    entries queued before or after the listing, or moved
+    around while it fills in, never end up inside it, and
+    pages added one after another still end up uniformly
+    shuffled among themselves.
+
+    Args:
+        queue: PlayQueue the listing is queued on
+    """
+
+    def __init__(self, queue):
+        self.queue = queue
+        self.start = len(queue)
+        self.count = 0
+        queue._spans.add(self)  # pylint: disable=protected-access
+
+    def shift(self, index: int, delta: int):
+        """
+        Follow an entry inserted or removed at a position
+
+        An insert at the first position of the span lands
+        before it, one strictly inside joins it.
+
+        Args:
+            index: int position of the change
+            delta: int 1 for an insert, -1 for a removal
+
+        Returns:
+            None
+        """
+        if index < self.start or (delta > 0 and index == self.start):
+            self.start += delta
+        elif index < self.start + self.count:
+            self.count += delta
+
+    def drop_front(self, count: int):
+        """
+        Follow entries dropped from the front of the queue
+
+        Args:
+            count: int number of entries dropped
+
+        Returns:
+            None
+        """
+        inside = max(0, min(count - self.start, self.count))
+        self.start = max(0, self.start - count)
+        self.count -= inside
+
+    def insert(self, entry):
+        """
+        Insert an entry at a random position within the span
+
+        Args:
+            entry: QueueEntry to add
+
+        Returns:
+            None
+        """
+        index = random.randint(self.start, self.start + self.count)
+        self.queue.insert(index, entry, span=self)
+        self.count += 1
@@ -0,0 +1,203 @@
+"""Sampling profiler and event loop block detector for the live bot."""
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _stack(frame):
+    """
+    Names of the frames of a stack, outermost first
+
+    Args:
+        frame: frame object of the innermost frame
+
+    Returns:
+        List of str frame names
+    """
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler of every thread in the process
+
+    A background thread snapshots all thread stacks through
+    sys._current_frames() at a fixed interval, so the profiled
+    code runs unmodified at close to full speed. Alongside, a
+    heartbeat scheduled on the event loop detects when the loop
+    is blocked: whenever the heartbeat is late by more than the
+    threshold, the loop thread's stack is recorded as the culprit.
+    """
+
+    def __init__(self, loop, interval: float = 0.005, block_threshold: float = 0.1):
+        """
+        Args:
+            loop: asyncio event loop to watch
+            interval: float seconds between samples
+            block_threshold: float seconds of heartbeat delay counted as a block
+
+        Returns:
+            None
+        """
+        self.loop = loop
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.loop_thread = None
+
+        self.samples = 0
+        self.stacks = Counter()
+        self.loop_stacks = Counter()
+        self.blocks = []
+
+        self._heartbeat = 0.0
+        self._blocked_since = None
+        self._blocked_stacks = Counter()
+        self._stop = threading.Event()
+
+    def _beat(self):
+        self._heartbeat = time.monotonic()
+        if not self._stop.is_set():
+            self.loop.call_later(self.interval, self._beat)
+
+    def _sample(self):
+        me = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        while not self._stop.wait(self.interval):
+            now = time.monotonic()
+            frames = sys._current_frames()  # pylint: disable=protected-access
+            self.samples += 1
+            for ident, frame in frames.items():
+                if ident == me:
+                    continue
+                stack = _stack(frame)
+                thread = names.get(ident, str(ident))
+                self.stacks[(thread,) + tuple(stack)] += 1
+                if ident == self.loop_thread:
+                    self.loop_stacks[tuple(stack)] += 1
+
+            lag = now - self._heartbeat
+            loop_frame = frames.get(self.loop_thread)
+            if lag > self.block_threshold and loop_frame is not None:
+                if self._blocked_since is None:
+                    self._blocked_since = self._heartbeat
+                self._blocked_stacks[tuple(_stack(loop_frame))] += 1
+            elif self._blocked_since is not None:
+                self._end_block(now)
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+        if self._blocked_since is not None:
+            self._end_block(time.monotonic())
+
+    def _end_block(self, now: float):
+        stack, _ = self._blocked_stacks.most_common(1)[0]
+        self.blocks.append((now - self._blocked_since, stack))
+        self._blocked_since = None
+        self._blocked_stacks.clear()
+
+    async def run(self, seconds: float):
+        """
+        Profile the process for a while
+
+        Must be awaited on the loop being watched.
+
+        Args:
+            seconds: float length of the profiling window
+
+        Returns:
+            None
+        """
+        self.loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._beat()
+        sampler = threading.Thread(target=self._sample, name="profiler", daemon=True)
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self._stop.set()
+            await self.loop.run_in_executor(None, sampler.join)
+
+    def top(self, count: int = 10, loop_only: bool = True):
+        """
+        Hottest functions by samples
+
+        Args:
+            count: int number of functions to list
+            loop_only: bool only count the event loop thread
+
+        Returns:
+            Tuple of lists of (str function, int samples), by samples on
+            top of the stack and by samples anywhere in the stack.
+        """
+        own, total = Counter(), Counter()
+        if loop_only:
+            stacks = self.loop_stacks.items()
+        else:
+            stacks = ((stack[1:], hits) for stack, hits in self.stacks.items())
+        for stack, hits in stacks:
+            if not stack:
+                continue
+            own[stack[-1]] += hits
+            for name in set(stack):
+                total[name] += hits
+        return own.most_common(count), total.most_common(count)
+
+    def collapsed(self) -> str:
+        """
+        All samples in the collapsed stack format
+
+        One line per distinct stack, frames separated by
+        semicolons and followed by the sample count, as read
+        by flamegraph.pl, speedscope and friends.
+
+        Returns:
+            str collapsed stacks
+        """
+        return "".join(
+            f"{';'.join(stack)} {hits}\n" for stack, hits in self.stacks.most_common()
+        )
+
+    def report(self, count: int = 10) -> str:
+        """
+        Human readable summary of the profile
+
+        Args:
+            count: int number of entries per section
+
+        Returns:
+            str report
+        """
+        lines = [f"{self.samples} samples every {self.interval * 1000:.0f}ms"]
+        loop_samples = sum(self.loop_stacks.values()) or 1
+        own, total = self.top(count)
+
+        lines.append("Event loop, on top of stack:")
+        for name, hits in own:
+            lines.append(f"  {hits * 100 / loop_samples:5.1f}%  {name}")
+        lines.append("Event loop, anywhere in stack:")
+        for name, hits in total:
+            lines.append(f"  {hits * 100 / loop_samples:5.1f}%  {name}")
+
+        blocked = sum(duration for duration, _ in self.blocks)
+        lines.append(
+            f"Loop blocked {len(self.blocks)} times over "
+            f"{self.block_threshold * 1000:.0f}ms, {blocked:.2f}s total:"
+        )
+        for duration, stack in sorted(self.blocks, reverse=True)[:count]:
+            # Innermost frames are the most telling
+            where = " < ".join(reversed(stack[-3:]))
+            lines.append(f"  {duration * 1000:7.0f}ms  {where}")
+        return "\n".join(lines)
@@ -0,0 +1,33 @@
+"""Shared HTTP session for all Plex traffic."""
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def build_session(pool_size: int = 4, retries: int = 2, backoff: float = 0.3):
+    """
+    Creates a keep-alive, connection pooled session
+
+    Handed to PlexServer and used for every art download, so
+    all requests to the Plex host reuse warm TCP/TLS connections.
+
+    Args:
+        pool_size: int connections kept open per host
+        retries: int retries on connection errors and gateway errors
+        backoff: float exponential backoff factor between retries
+
+    Returns:
+        requests.Session
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        backoff_factor=backoff,
+        status_forcelist=(502, 503, 504),
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
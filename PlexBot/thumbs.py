@@ -0,0 +1,199 @@
+"""Shared cache of album and playlist art."""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+plex_log = logging.getLogger("Plex")
+
+
+class ThumbnailCache:
+    """
+    Two tier cache of thumbnail bytes
+
+    Entries are addressed by a hash of the Plex thumb path and the
+    item's updatedAt, so changed art never serves a stale copy. The
+    memory tier is an LRU bounded by total bytes, the optional disk
+    tier keeps art across restarts within its own byte budget.
+    """
+
+    def __init__(self, max_bytes: int, disk_dir=None, disk_max_bytes: int = 0):
+        """
+        Initializes empty cache tiers
+
+        Args:
+            max_bytes: int memory budget in bytes
+            disk_dir: pathlib.Path for the disk tier, None to disable it
+            disk_max_bytes: int disk budget in bytes
+
+        Returns:
+            None
+
+        Raises:
+            None
+        """
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self._size = 0
+        self._disk_size = None
+
+        # Metrics
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def digest(path: str, updated_at) -> str:
+        """
+        Content address of a thumbnail
+
+        Args:
+            path: str Plex thumb path
+            updated_at: updatedAt of the owning item
+
+        Returns:
+            str hex digest
+        """
+        return hashlib.sha1(f"{path}@{updated_at}".encode()).hexdigest()
+
+    def get(self, path: str, updated_at, fetch):
+        """
+        Get thumbnail bytes, fetching them on a miss
+
+        Blocking, meant to be run through the PlexGateway.
+
+        Args:
+            path: str Plex thumb path
+            updated_at: updatedAt of the owning item
+            fetch: callable returning the image bytes
+
+        Returns:
+            bytes of the image
+        """
+        key = self.digest(path, updated_at)
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return data
+
+        data = self._disk_read(key)
+        if data is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            data = fetch()
+            self._disk_write(key, data)
+
+        self._remember(key, data)
+        return data
+
+    def _remember(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                return
+            self._items[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, old = self._items.popitem(last=False)
+                self._size -= len(old)
+                self.evictions += 1
+
+    def _disk_path(self, key: str):
+        return self.disk_dir / key[:2] / key
+
+    def _disk_read(self, key: str):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "rb") as art_file:
+                return art_file.read()
+        except OSError:
+            return None
+
+    def _disk_write(self, key: str, data: bytes):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            with open(tmp, "wb") as art_file:
+                art_file.write(data)
+            os.replace(tmp, path)
+        except OSError as err:
+            plex_log.warning("Unable to write thumbnail cache: %s", err)
+            return
+
+        with self._lock:
+            if self._disk_size is None:
+                self._disk_size = sum(st.st_size for st, _ in self._disk_files())
+            else:
+                self._disk_size += len(data)
+            if self._disk_size > self.disk_max_bytes:
+                self._disk_evict()
+
+    def _disk_files(self):
+        """
+        Files of the disk tier with their stat results
+
+        Files removed while listing, by another eviction or
+        by hand, are skipped.
+
+        Returns:
+            List of tuples of os.stat_result and pathlib.Path
+        """
+        files = []
+        for art in self.disk_dir.glob("*/*"):
+            try:
+                files.append((art.stat(), art))
+            except OSError:
+                continue
+        return files
+
+    def _disk_evict(self):
+        """
+        Remove the least recently written files until under budget
+
+        Returns:
+            None
+        """
+        files = sorted(self._disk_files(), key=lambda item: item[0].st_mtime)
+        # Leave some headroom so this doesn't run on every write
+        target = self.disk_max_bytes * 0.9
+        for stat, art in files:
+            if self._disk_size <= target:
+                break
+            try:
+                art.unlink()
+            except FileNotFoundError:
+                # Already gone, it no longer counts either
+                pass
+            except OSError:
+                continue
+            self._disk_size -= stat.st_size
+
+    def stats(self):
+        """
+        Snapshot of cache metrics
+
+        Returns:
+            Dict of hit, miss and size counters.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "items": len(self._items),
+                "bytes": self._size,
+            }
@@ -0,0 +1,156 @@
+"""Event loop lag watchdog."""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from . import metrics
+
+bot_log = logging.getLogger("Bot")
+
+
+class LoopWatchdog:
+    """
+    Measures event loop scheduling lag and names what caused stalls
+
+    A coroutine wakes up at a fixed interval and records how late
+    it was. A companion thread watches that heartbeat, and while
+    it is overdue by more than the threshold it captures the loop
+    thread's stack and the task running on it, since by the time
+    the loop itself notices, the culprit is long gone. Stalls are
+    counted per command in metrics.
+    """
+
+    def __init__(self, loop, interval: float = 0.05, threshold: float = 0.25, on_stall=None):
+        """
+        Args:
+            loop: asyncio event loop to watch
+            interval: float seconds between heartbeats
+            threshold: float seconds of lag counted as a stall
+            on_stall: callable(lag, command) called on the loop after a stall
+
+        Returns:
+            None
+        """
+        self.loop = loop
+        self.interval = interval
+        self.threshold = threshold
+        self.on_stall = on_stall
+        self.stalls = 0
+        self.max_lag = 0.0
+
+        self._loop_thread = None
+        self._heartbeat = 0.0
+        self._capture = None
+        self._task = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """
+        Start watching, does nothing if already running
+
+        Must be called on the loop thread.
+
+        Returns:
+            None
+        """
+        if self._task and not self._task.done():
+            return
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = self.loop.create_task(self._beat())
+        threading.Thread(target=self._watch, name="watchdog", daemon=True).start()
+
+    def stop(self):
+        """
+        Stop watching
+
+        Returns:
+            None
+        """
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+
+    async def _beat(self):
+        """
+        Coroutine measuring how late each wakeup is
+
+        Returns:
+            None
+        """
+        try:
+            while True:
+                start = self._heartbeat = time.monotonic()
+                await asyncio.sleep(self.interval)
+                lag = max(0.0, time.monotonic() - start - self.interval)
+                metrics.LOOP_LAG.observe(lag)
+                if lag > self.threshold:
+                    self._report(lag)
+        finally:
+            self._stop.set()
+
+    def _watch(self):
+        """
+        Thread capturing the loop thread while the heartbeat is overdue
+
+        Returns:
+            None
+        """
+        while not self._stop.wait(self.interval):
+            late = time.monotonic() - self._heartbeat - self.interval
+            if late <= self.threshold or self._capture is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)  # pylint: disable=protected-access
+            if frame is None:
+                continue
+            stack = traceback.format_stack(frame)
+            self._capture = (asyncio.current_task(self.loop), stack)
+
+    @staticmethod
+    def _blame(task) -> str:
+        """
+        Name what a task was doing
+
+        Args:
+            task: asyncio.Task running during the stall, or None
+
+        Returns:
+            str command name, else the coroutine of the task
+        """
+        if task is None:
+            return "callback"
+        command = metrics.ACTIVE_COMMANDS.get(task)
+        if command:
+            return command
+        coro = task.get_coro()
+        return getattr(coro, "__qualname__", repr(coro))
+
+    def _report(self, lag: float):
+        """
+        Account for a stall once the loop is running again
+
+        Args:
+            lag: float seconds the heartbeat was late
+
+        Returns:
+            None
+        """
+        capture, self._capture = self._capture, None
+        task, stack = capture if capture else (None, [])
+        command = self._blame(task)
+
+        self.stalls += 1
+        self.max_lag = max(self.max_lag, lag)
+        metrics.LOOP_STALLS.inc(command=command)
+        bot_log.warning(
+            "Event loop stalled for %.0fms in %s\n%s",
+            lag * 1000,
+            command,
+            "".join(stack[-8:]) if stack else "(stack not captured)",
+        )
+        if self.on_stall:
+            self.on_stall(lag, command)
@@ -0,0 +1,263 @@
+"""
+Offline benchmarks of PlexBot's hot paths.
+
+Runs the Plex cog against a stand-in Plex server serving a
+synthetic library, with stub voice clients in place of discord
+voice, so no Plex server, discord connection or FFmpeg is needed.
+
+Usage:
+    python -m bench [--tracks N] [--playlist-size N] [--latency-ms MS]
+                    [--iterations N] [--index] [--out FILE]
+
+Prints one JSON document with the results, all times in ms:
+    play: latency from invoking play until the voice client plays
+    album, playlist: time until the command returns (first page
+        queued) and until every page is queued, with tracks/s
+    embed: _build_embed_track with a cold and a warm art cache
+    transition: gap between a track ending and the next starting
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from discord.ext.commands import Bot
+
+import PlexBot.bot
+from PlexBot.bot import Plex
+from PlexBot.playqueue import QueueEntry
+
+from .fake_plex import FakePlex
+from .fake_plex import Library
+from .stubs import StubSource
+from .stubs import make_context
+
+bench_log = logging.getLogger("Bench")
+
+
+def summarize(samples):
+    """
+    Percentiles of a list of durations in seconds
+
+    Args:
+        samples: list of float seconds
+
+    Returns:
+        Dict of n, mean, p50, p95 and max in ms
+    """
+    if not samples:
+        return {"n": 0}
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        "n": len(ms),
+        "mean": round(statistics.mean(ms), 3),
+        "p50": round(ms[len(ms) // 2], 3),
+        "p95": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+        "max": round(ms[-1], 3),
+    }
+
+
+async def wait_until(predicate, timeout: float = 30, interval: float = 0.001):
+    """Poll predicate until it holds, failing after timeout seconds."""
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("benchmark condition never met")
+        await asyncio.sleep(interval)
+
+
+class Bench:
+    """
+    One benchmark run against a fresh cog
+
+    Args:
+        args: argparse.Namespace of the command line
+        fake: FakePlex serving the library
+        cache_dir: pathlib.Path for the cog's caches
+    """
+
+    def __init__(self, args, fake, cache_dir):
+        self.args = args
+        self.fake = fake
+        self.bot = Bot(command_prefix="?")
+        self.cog = Plex(
+            self.bot,
+            base_url=fake.url,
+            plex_token="bench",
+            lib_name="Music",
+            lyrics_token=None,
+            index=args.index,
+            cache_dir=cache_dir,
+            thumb_disk_cache_mb=0,
+        )
+        # Binds the commands to the cog, nothing connects to discord
+        self.bot.add_cog(self.cog)
+        self.guilds = iter(range(1, 1 << 30))
+
+    def context(self, play_seconds: float):
+        return make_context(self.bot.loop, next(self.guilds), play_seconds)
+
+    async def release(self, ctx):
+        """Stop and forget the player of a context."""
+        player = self.cog._get_player(ctx, create=False)
+        if player:
+            await player.disconnect()
+            player.task.cancel()
+            self.cog._reap_player(player)
+
+    async def connect(self):
+        start = time.perf_counter()
+        await asyncio.wait_for(self.cog.connected.wait(), 30)
+        result = {"connect_ms": round((time.perf_counter() - start) * 1000, 3)}
+        if self.args.index:
+            start = time.perf_counter()
+            await wait_until(
+                lambda: len(self.cog.index) >= len(self.fake.library.tracks), 120
+            )
+            result["index_sync_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        return result
+
+    async def bench_play(self):
+        tracks = list(self.fake.library.tracks.values())
+        samples = []
+        for num in range(self.args.iterations):
+            ctx = self.context(play_seconds=60)
+            title = tracks[(num * 7919) % len(tracks)]["title"]
+            start = time.perf_counter()
+            await self.cog.play(ctx, title)
+            await wait_until(lambda: ctx.voice.clients and ctx.voice.clients[0].plays)
+            samples.append(ctx.voice.clients[0].plays[0] - start)
+            await self.release(ctx)
+        return summarize(samples)
+
+    async def bench_enqueue(self, invoke, total: int):
+        first, full = [], []
+        for _ in range(self.args.iterations):
+            ctx = self.context(play_seconds=60)
+            start = time.perf_counter()
+            await invoke(ctx)
+            first.append(time.perf_counter() - start)
+            player = self.cog._get_player(ctx, create=False)
+            await wait_until(lambda: not player.fills, 120)
+            full.append(time.perf_counter() - start)
+            await self.release(ctx)
+        result = {"tracks": total, "first_page": summarize(first), "all": summarize(full)}
+        result["tracks_per_s"] = round(total / statistics.mean(full), 1)
+        return result
+
+    async def bench_album(self):
+        album = max(self.fake.library.albums.values(), key=lambda a: a["leafCount"])
+        return await self.bench_enqueue(
+            lambda ctx: self.cog.album(ctx, album["title"]), album["leafCount"]
+        )
+
+    async def bench_playlist(self):
+        playlist = next(iter(self.fake.library.playlists.values()))
+        return await self.bench_enqueue(
+            lambda ctx: self.cog.playlist(ctx, playlist["title"]),
+            playlist["leafCount"],
+        )
+
+    def entry(self, track):
+        return QueueEntry(
+            track["ratingKey"],
+            track["title"],
+            track["parentTitle"],
+            track["grandparentTitle"],
+            track["duration"],
+            track["parentThumb"],
+        )
+
+    async def bench_embed(self):
+        # One entry per album, so every cold build misses the art cache
+        lib = self.fake.library
+        albums = list(lib.children.values())[: self.args.iterations]
+        entries = [self.entry(lib.tracks[keys[0]]) for keys in albums]
+
+        result = {}
+        for phase in ("cold", "warm"):
+            samples = []
+            for entry in entries:
+                start = time.perf_counter()
+                await self.cog.gateway.run(self.cog._build_embed_track, entry)
+                samples.append(time.perf_counter() - start)
+            result[phase] = summarize(samples)
+        return result
+
+    async def bench_transition(self):
+        ctx = self.context(play_seconds=self.args.play_seconds)
+        count = self.args.transitions + 1
+        tracks = list(self.fake.library.tracks.values())[:count]
+        player = self.cog._get_player(ctx)
+        await player.connect(ctx)
+        player.enqueue_many([self.entry(track) for track in tracks])
+        voice = player.voice_channel
+        await wait_until(lambda: len(voice.plays) >= count, 30 + count * 5)
+        gaps = [start - end for end, start in zip(voice.ends, voice.plays[1:])]
+        await self.release(ctx)
+        return summarize(gaps)
+
+    async def run(self):
+        results = await self.connect()
+        for name in ("play", "album", "playlist", "embed", "transition"):
+            bench_log.info("Running %s", name)
+            results[name] = await getattr(self, f"bench_{name}")()
+
+        # Stop the cog's background tasks before the loop closes
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.cog.gateway.shutdown()
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline PlexBot benchmarks")
+    parser.add_argument("--tracks", type=int, default=5000)
+    parser.add_argument("--album-size", type=int, default=20)
+    parser.add_argument("--playlist-size", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--transitions", type=int, default=10)
+    parser.add_argument("--play-seconds", type=float, default=0.2)
+    parser.add_argument("--index", action="store_true", help="enable the search index")
+    parser.add_argument("--out", type=Path, help="also write the JSON here")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    # Only the URL building of audio sources is measured, never FFmpeg
+    PlexBot.bot.FFmpegOpusAudio = PlexBot.bot.FFmpegPCMAudio = StubSource
+
+    library = Library(
+        tracks=args.tracks,
+        album_size=args.album_size,
+        playlist_size=args.playlist_size,
+    )
+    fake = FakePlex(library, latency_ms=args.latency_ms).start()
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            bench = Bench(args, fake, Path(cache_dir))
+            results = bench.bot.loop.run_until_complete(bench.run())
+    finally:
+        fake.stop()
+
+    report = {
+        "config": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+        "python": platform.python_version(),
+        "plex_requests": fake.requests,
+        "results": results,
+    }
+    out = json.dumps(report, indent=2)
+    print(out)
+    if args.out:
+        args.out.write_text(out + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""Stand-in Plex server serving a synthetic music library."""
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from urllib.parse import parse_qsl
+from urllib.parse import urlsplit
+from xml.sax.saxutils import quoteattr
+
+SECTION_KEY = "1"
+PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+
+_METADATA = re.compile(r"^/library/metadata/([\d,]+)(/children)?$")
+_PLAYLIST_ITEMS = re.compile(r"^/playlists/(\d+)/items$")
+
+
+def _attrs(**attrs):
+    return " ".join(f"{k}={quoteattr(str(v))}" for k, v in attrs.items() if v is not None)
+
+
+class Library:
+    """
+    Deterministic synthetic music library
+
+    Every album has the same number of tracks, albums are spread
+    over the artists round robin. One big playlist holds the first
+    playlist_size tracks.
+    """
+
+    def __init__(
+        self,
+        tracks: int = 5000,
+        album_size: int = 20,
+        artists: int = 50,
+        playlist_size: int = 1000,
+        duration_ms: int = 2000,
+    ):
+        self.tracks = {}
+        self.albums = {}
+        self.children = {}
+        self.playlists = {}
+        now = int(time.time())
+
+        albums = max(1, -(-tracks // album_size))
+        for num in range(albums):
+            key = 100000 + num
+            self.albums[key] = {
+                "ratingKey": key,
+                "key": f"/library/metadata/{key}/children",
+                "type": "album",
+                "title": f"Album {num}",
+                "parentTitle": f"Artist {num % artists}",
+                "thumb": f"/library/metadata/{key}/thumb/{now}",
+                "addedAt": now,
+                "updatedAt": now,
+                "leafCount": 0,
+            }
+        for num in range(tracks):
+            key = 1 + num
+            album = self.albums[100000 + num // album_size]
+            album["leafCount"] += 1
+            self.children.setdefault(album["ratingKey"], []).append(key)
+            self.tracks[key] = {
+                "ratingKey": key,
+                "key": f"/library/metadata/{key}",
+                "type": "track",
+                "title": f"Track {num}",
+                "parentRatingKey": album["ratingKey"],
+                "parentTitle": album["title"],
+                "grandparentTitle": album["parentTitle"],
+                "parentThumb": album["thumb"],
+                "index": num % album_size + 1,
+                "duration": duration_ms,
+                "addedAt": now,
+                "updatedAt": now,
+            }
+
+        items = list(self.tracks)[:playlist_size]
+        self.playlists[900000] = {
+            "ratingKey": 900000,
+            "key": "/playlists/900000/items",
+            "type": "playlist",
+            "title": "Bench Playlist",
+            "playlistType": "audio",
+            "smart": 0,
+            "composite": f"/playlists/900000/composite/{now}",
+            "duration": duration_ms * len(items),
+            "leafCount": len(items),
+            "addedAt": now,
+            "updatedAt": now,
+            "items": items,
+        }
+
+    def album_tracks(self, key: int):
+        return [self.tracks[track] for track in self.children.get(key, [])]
+
+    @staticmethod
+    def track_xml(track) -> str:
+        key = track["ratingKey"]
+        return (
+            f"<Track {_attrs(**track)}>"
+            f'<Media id="{key}" duration="{track["duration"]}" audioCodec="flac"'
+            ' audioChannels="2" container="flac">'
+            f'<Part id="{key}" key="/library/parts/{key}/file.flac"'
+            f' duration="{track["duration"]}" container="flac" size="1000000"/>'
+            "</Media></Track>"
+        )
+
+    @staticmethod
+    def album_xml(album) -> str:
+        return f"<Directory {_attrs(**album)}/>"
+
+    @staticmethod
+    def playlist_xml(playlist) -> str:
+        attrs = {k: v for k, v in playlist.items() if k != "items"}
+        return f"<Playlist {_attrs(**attrs)}/>"
+
+
+class FakePlex:
+    """
+    Threaded HTTP server answering the Plex endpoints the bot uses
+
+    Args:
+        library: Library to serve
+        latency_ms: float artificial delay added to every response
+        thumb_bytes: int size of the fake art payload
+
+    Setting art_missing makes every art request answer 404.
+    """
+
+    def __init__(self, library: Library, latency_ms: float = 0, thumb_bytes: int = 16384):
+        self.library = library
+        self.latency = latency_ms / 1000
+        self.thumb = PNG_MAGIC + os.urandom(max(0, thumb_bytes - len(PNG_MAGIC)))
+        self.requests = {}
+        self.art_missing = False
+        self._lock = threading.Lock()
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                fake.handle(self)
+
+            def log_message(self, *args):  # pylint: disable=arguments-differ
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _count(self, route: str):
+        with self._lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+
+    def handle(self, req):
+        """
+        Route a request and write the response
+
+        Args:
+            req: http.server.BaseHTTPRequestHandler of the request
+
+        Returns:
+            None
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        parts = urlsplit(req.path)
+        path = parts.path.rstrip("/") or "/"
+        params = dict(parse_qsl(parts.query))
+        start = int(
+            req.headers.get("X-Plex-Container-Start")
+            or params.get("X-Plex-Container-Start", 0)
+        )
+        size = req.headers.get("X-Plex-Container-Size") or params.get(
+            "X-Plex-Container-Size"
+        )
+        size = int(size) if size else None
+
+        route, body, ctype = self.route(path, params, start, size)
+        self._count(route)
+        if body is None:
+            req.send_response(404)
+            req.send_header("Content-Length", "0")
+            req.end_headers()
+            return
+        if isinstance(body, str):
+            body = body.encode()
+        req.send_response(200)
+        req.send_header("Content-Type", ctype)
+        req.send_header("Content-Length", str(len(body)))
+        req.end_headers()
+        req.wfile.write(body)
+
+    def route(self, path, params, start, size):
+        """
+        Build the response of a request
+
+        Returns:
+            Tuple of str route name, body or None for 404, str content type
+        """
+        lib = self.library
+        xml = "text/xml;charset=utf-8"
+
+        if path == "/":
+            return "root", self._container(
+                "", friendlyName="Bench", machineIdentifier="bench", version="1.20.0"
+            ), xml
+        if path == "/identity":
+            return "identity", self._container("", machineIdentifier="bench"), xml
+        if path == "/library":
+            return "library", self._container("", title1="Plex Library"), xml
+        if path == "/library/sections":
+            section = (
+                f'<Directory key="{SECTION_KEY}" type="artist" title="Music"'
+                ' agent="tv.plex.agents.music" uuid="bench"/>'
+            )
+            return "sections", self._container(section), xml
+        if path == f"/library/sections/{SECTION_KEY}/all":
+            return "all", self._all(params, start, size), xml
+        if path.startswith("/photo/:/transcode") or "/thumb/" in path or "/composite/" in path:
+            return "art", None if self.art_missing else self.thumb, "image/png"
+        if path == "/playlists":
+            items = list(lib.playlists.values())
+            if "title" in params:
+                items = [p for p in items if p["title"] == params["title"]]
+            return "playlists", self._page(items, Library.playlist_xml, start, size), xml
+
+        match = _PLAYLIST_ITEMS.match(path)
+        if match:
+            playlist = lib.playlists.get(int(match.group(1)))
+            if not playlist:
+                return "playlist_items", None, xml
+            items = [lib.tracks[key] for key in playlist["items"]]
+            return "playlist_items", self._page(items, Library.track_xml, start, size), xml
+
+        match = _METADATA.match(path)
+        if match:
+            keys = [int(key) for key in match.group(1).split(",")]
+            if match.group(2):
+                items = lib.album_tracks(keys[0])
+                return "children", self._page(items, Library.track_xml, start, size), xml
+            body = []
+            for key in keys:
+                if key in lib.tracks:
+                    body.append(Library.track_xml(lib.tracks[key]))
+                elif key in lib.albums:
+                    body.append(Library.album_xml(lib.albums[key]))
+            if not body:
+                return "metadata", None, xml
+            return "metadata", self._container("".join(body)), xml
+
+        return "unknown", None, xml
+
+    def _all(self, params, start, size):
+        libtype = params.get("type", "10")
+        if libtype == "9":
+            items, render = list(self.library.albums.values()), Library.album_xml
+        else:
+            items, render = list(self.library.tracks.values()), Library.track_xml
+        title = params.get("title")
+        if title:
+            title = title.lower()
+            items = [item for item in items if title in item["title"].lower()]
+        for field in ("addedAt", "updatedAt"):
+            since = params.get(f"{field}>>")
+            if since:
+                items = [item for item in items if item[field] >= int(since)]
+        return self._page(items, render, start, size)
+
+    def _page(self, items, render, start, size):
+        total = len(items)
+        items = items[start : start + size if size is not None else None]
+        return self._container(
+            "".join(render(item) for item in items),
+            size=len(items),
+            totalSize=total,
+            offset=start,
+        )
+
+    @staticmethod
+    def _container(body: str, **attrs) -> str:
+        return f"<MediaContainer {_attrs(**attrs)}>{body}</MediaContainer>"
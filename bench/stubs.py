@@ -0,0 +1,182 @@
+"""Stand-ins for the discord objects commands touch."""
+import asyncio
+import itertools
+import threading
+import time
+from types import SimpleNamespace
+
+_ids = itertools.count(1)
+
+
+class StubSource:
+    """
+    Audio source that never spawns FFmpeg
+
+    Takes the same arguments as discord.FFmpegOpusAudio and
+    FFmpegPCMAudio, so the bot's own URL building still runs.
+    """
+
+    def __init__(self, url, **kwargs):
+        self.url = url
+        self.kwargs = kwargs
+        self.cleaned_up = False
+
+    def cleanup(self):
+        self.cleaned_up = True
+
+
+class StubMessage:
+    """Sent message supporting the calls the bot makes on messages."""
+
+    def __init__(self, channel, content=None, embed=None, file=None):
+        self.id = next(_ids)
+        self.channel = channel
+        self.content = content
+        self.embed = embed
+        self.file = file
+        self.deleted = False
+
+    async def delete(self):
+        self.deleted = True
+
+    async def edit(self, **kwargs):
+        self.embed = kwargs.get("embed", self.embed)
+
+    async def add_reaction(self, emoji):
+        pass
+
+    async def remove_reaction(self, emoji, user):
+        pass
+
+    async def clear_reactions(self):
+        pass
+
+
+class StubChannel:
+    """Text channel recording what was sent and when."""
+
+    def __init__(self):
+        self.id = next(_ids)
+        self.sent = []
+
+    async def send(self, content=None, *, embed=None, file=None, delete_after=None):
+        msg = StubMessage(self, content, embed, file)
+        self.sent.append((time.perf_counter(), msg))
+        return msg
+
+
+class StubVoiceClient:
+    """
+    Voice client playing every source for a fixed time
+
+    Like discord.VoiceClient, the after callback runs on another
+    thread once a source finishes or is stopped, so the bot's
+    thread hand-off is exercised as in production.
+
+    Args:
+        loop: asyncio event loop of the bot
+        play_seconds: float how long each source "plays"
+    """
+
+    def __init__(self, loop, play_seconds: float):
+        self.loop = loop
+        self.play_seconds = play_seconds
+        self.plays = []
+        self.ends = []
+        self.played = asyncio.Event()
+        self._lock = threading.Lock()
+        self._source = None
+        self._after = None
+        self._timer = None
+        self._connected = True
+
+    def is_connected(self):
+        return self._connected
+
+    def is_playing(self):
+        return self._source is not None
+
+    def is_paused(self):
+        return False
+
+    def play(self, source, *, after=None):
+        import discord
+
+        with self._lock:
+            if self._source is not None:
+                raise discord.ClientException("Already playing audio.")
+            self._source, self._after = source, after
+            self.plays.append(time.perf_counter())
+            self._timer = threading.Timer(self.play_seconds, self._finish)
+            self._timer.daemon = True
+            self._timer.start()
+        self.played.set()
+
+    def _finish(self):
+        with self._lock:
+            source, after = self._source, self._after
+            if source is None:
+                return
+            self._source = self._after = None
+            self.ends.append(time.perf_counter())
+        source.cleanup()
+        if after:
+            after(None)
+
+    def stop(self):
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+        # discord.py calls after from its player thread on stop too
+        threading.Thread(target=self._finish, daemon=True).start()
+
+    def pause(self):
+        pass
+
+    def resume(self):
+        pass
+
+    async def disconnect(self, *, force=False):
+        self.stop()
+        self._connected = False
+
+
+class StubVoiceChannel:
+    """Voice channel handing out StubVoiceClients."""
+
+    def __init__(self, loop, play_seconds: float):
+        self.loop = loop
+        self.play_seconds = play_seconds
+        self.clients = []
+
+    async def connect(self):
+        client = StubVoiceClient(self.loop, self.play_seconds)
+        self.clients.append(client)
+        return client
+
+
+def make_context(loop, guild_id: int, play_seconds: float):
+    """
+    Command context of a user sitting in a voice channel
+
+    Args:
+        loop: asyncio event loop of the bot
+        guild_id: int id of the fake guild
+        play_seconds: float how long each source "plays"
+
+    Returns:
+        types.SimpleNamespace standing in for a commands.Context
+    """
+    channel = StubChannel()
+    voice = StubVoiceChannel(loop, play_seconds)
+    author = SimpleNamespace(
+        id=guild_id, mention=f"<@{guild_id}>", voice=SimpleNamespace(channel=voice)
+    )
+    return SimpleNamespace(
+        guild=SimpleNamespace(id=guild_id),
+        author=author,
+        channel=channel,
+        message=SimpleNamespace(author=author, channel=channel),
+        send=channel.send,
+        voice=voice,
+    )
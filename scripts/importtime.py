@@ -0,0 +1,138 @@
+"""
+Import time audit of PlexBot.
+
+Imports the given modules in a fresh interpreter with
+`python -X importtime` and summarizes where startup time goes.
+
+Usage:
+    python scripts/importtime.py [-n TOP] [--json] [MODULE ...]
+
+Defaults to auditing PlexBot.bot, the module __main__ imports
+once the config has been loaded. Run it from the repository root
+with the bot's dependencies installed.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+DEFAULT_MODULES = ["PlexBot.bot"]
+MARKER = "-- audit start --"
+
+
+def measure(modules):
+    """
+    Import modules in a child interpreter and collect timings
+
+    Args:
+        modules: list of str module names to import
+
+    Returns:
+        List of dicts with module, self_us, cumulative_us and depth,
+        in the order the imports finished.
+
+    Raises:
+        RuntimeError: The import failed
+    """
+    # Everything before the marker is interpreter startup, not ours
+    code = f"import sys; sys.stderr.write('{MARKER}\\n'); " + "; ".join(
+        f"import {module}" for module in modules
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+
+    rows, errors = [], []
+    lines = proc.stderr.splitlines()
+    if MARKER in lines:
+        lines = lines[lines.index(MARKER) + 1 :]
+    for line in lines:
+        if not line.startswith("import time:"):
+            errors.append(line)
+            continue
+        fields = line[len("import time:") :].split("|")
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except ValueError:
+            # Column header
+            continue
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append(
+            {
+                "module": name.strip(),
+                "self_us": self_us,
+                "cumulative_us": cumulative_us,
+                "depth": depth,
+            }
+        )
+
+    if proc.returncode:
+        raise RuntimeError("\n".join(errors) or f"exit status {proc.returncode}")
+    return rows
+
+
+def summarize(rows, top: int):
+    """
+    Summary of the heaviest imports
+
+    Args:
+        rows: list of dicts from measure
+        top: int number of modules to list
+
+    Returns:
+        Dict with the total time, the heaviest top level packages
+        by cumulative time and the heaviest modules by self time.
+    """
+    # Top level packages are those imported directly by the audited code
+    roots = [row for row in rows if row["depth"] == 0]
+    packages = {}
+    for row in rows:
+        package = row["module"].split(".")[0]
+        packages[package] = packages.get(package, 0) + row["self_us"]
+
+    return {
+        "total_us": sum(row["cumulative_us"] for row in roots),
+        "modules": len(rows),
+        "by_package": sorted(packages.items(), key=lambda kv: -kv[1])[:top],
+        "by_self": sorted(rows, key=lambda row: -row["self_us"])[:top],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("-n", "--top", type=int, default=15)
+    parser.add_argument("--json", action="store_true", help="print raw JSON")
+    args = parser.parse_args()
+
+    try:
+        rows = measure(args.modules)
+    except RuntimeError as err:
+        sys.exit(f"Import failed:\n{err}")
+    summary = summarize(rows, args.top)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    print(
+        f"{', '.join(args.modules)}: {summary['total_us'] / 1000:.1f} ms,"
+        f" {summary['modules']} modules"
+    )
+    print("\nBy package (self time, ms):")
+    for package, self_us in summary["by_package"]:
+        print(f"  {self_us / 1000:8.1f}  {package}")
+    print("\nBy module (self / cumulative, ms):")
+    for row in summary["by_self"]:
+        print(
+            f"  {row['self_us'] / 1000:8.1f} {row['cumulative_us'] / 1000:8.1f}"
+            f"  {row['module']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Fixtures running the Plex cog against the benchmark's fake Plex server."""
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def fake_plex():
+    """Small synthetic library served over HTTP."""
+    fake_plex = pytest.importorskip("bench.fake_plex")
+    fake = fake_plex.FakePlex(
+        fake_plex.Library(tracks=60, album_size=10, playlist_size=30)
+    ).start()
+    yield fake
+    fake.stop()
+
+
+@pytest.fixture
+def plex_cog(fake_plex, tmp_path):
+    """Connected Plex cog, run coroutines on it with cog.bot.loop."""
+    pytest.importorskip("discord")
+    from discord.ext.commands import Bot
+
+    import PlexBot.bot
+    from bench.stubs import StubSource
+    from PlexBot.bot import Plex
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    bot = Bot(command_prefix="?", loop=loop)
+    cog = Plex(
+        bot,
+        base_url=fake_plex.url,
+        plex_token="test",
+        lib_name="Music",
+        lyrics_token=None,
+        cache_dir=tmp_path,
+        timeout=5,
+    )
+    bot.add_cog(cog)
+    originals = PlexBot.bot.FFmpegOpusAudio, PlexBot.bot.FFmpegPCMAudio
+    PlexBot.bot.FFmpegOpusAudio = PlexBot.bot.FFmpegPCMAudio = StubSource
+    loop.run_until_complete(asyncio.wait_for(cog.connected.wait(), 10))
+    yield cog
+
+    PlexBot.bot.FFmpegOpusAudio, PlexBot.bot.FFmpegPCMAudio = originals
+    cog.watchdog.stop()
+    tasks = asyncio.all_tasks(loop)
+    for task in tasks:
+        task.cancel()
+    loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+    cog.gateway.shutdown()
+    loop.close()
+    asyncio.set_event_loop(None)
@@ -0,0 +1,68 @@
+"""FFmpeg arguments of the audio sources built for each playback mode."""
+from types import SimpleNamespace
+
+import pytest
+
+discord = pytest.importorskip("discord")
+
+from PlexBot.bot import Plex  # noqa: E402 pylint: disable=wrong-import-position
+
+URL = "http://plex/stream"
+
+
+@pytest.fixture
+def spawned(monkeypatch):
+    """Capture the FFmpeg command lines instead of running them."""
+    calls = []
+
+    def spawn(self, args, **kwargs):
+        calls.append(args)
+        return SimpleNamespace(
+            pid=0, returncode=0, stdout=None, kill=lambda: None, poll=lambda: 0
+        )
+
+    monkeypatch.setattr(discord.player.FFmpegAudio, "_spawn_process", spawn)
+    return calls
+
+
+def make_cog(mode, bitrate=96):
+    return SimpleNamespace(
+        audio_mode=mode, bitrate=bitrate, _transcode_url=lambda track: URL
+    )
+
+
+def make_track(codec):
+    return SimpleNamespace(
+        getStreamURL=lambda: URL, media=[SimpleNamespace(audioCodec=codec)]
+    )
+
+
+def option(args, flag):
+    return args[args.index(flag) + 1]
+
+
+def test_opus_file_is_copied(spawned):
+    source, url = Plex._create_source(make_cog("opus"), make_track("opus"))
+    assert isinstance(source, discord.FFmpegOpusAudio)
+    assert url == URL
+    assert option(spawned[0], "-c:a") == "copy"
+
+
+def test_other_codecs_encode_at_bitrate(spawned):
+    Plex._create_source(make_cog("opus", bitrate=96), make_track("flac"))
+    assert option(spawned[0], "-c:a") == "libopus"
+    assert option(spawned[0], "-b:a") == "96k"
+
+
+def test_transcode_output_is_copied(spawned):
+    source, _ = Plex._create_source(make_cog("transcode"), make_track("flac"))
+    assert isinstance(source, discord.FFmpegOpusAudio)
+    assert option(spawned[0], "-c:a") == "copy"
+    assert option(spawned[0], "-i") == URL
+
+
+def test_pcm_decodes(spawned):
+    source, _ = Plex._create_source(make_cog("pcm"), make_track("opus"))
+    assert isinstance(source, discord.FFmpegPCMAudio)
+    assert "-c:a" not in spawned[0]
+    assert option(spawned[0], "-f") == "s16le"
@@ -0,0 +1,69 @@
+"""Commands of the Plex cog against the fake Plex server."""
+import asyncio
+
+import pytest
+
+stubs = pytest.importorskip("bench.stubs")
+
+
+def run(cog, coro):
+    return cog.bot.loop.run_until_complete(coro)
+
+
+def context(cog, guild_id=1):
+    return stubs.make_context(cog.bot.loop, guild_id, play_seconds=60)
+
+
+def sent_embeds(ctx):
+    return [msg.embed for _, msg in ctx.channel.sent if msg.embed is not None]
+
+
+def test_playlist_without_art_still_queues(plex_cog, fake_plex):
+    fake_plex.art_missing = True
+    ctx = context(plex_cog)
+    run(plex_cog, plex_cog.play_playlist(ctx, "Bench Playlist"))
+
+    player = plex_cog._get_player(ctx, create=False)
+    assert player.current_entry or len(player.play_queue)
+    (embed,) = sent_embeds(ctx)
+    assert embed.title == "Added playlist to queue"
+    assert not embed.thumbnail.url
+
+
+def test_failed_art_is_not_cached(plex_cog, fake_plex):
+    track = next(iter(fake_plex.library.tracks.values()))
+    path = track["parentThumb"]
+
+    fake_plex.art_missing = True
+    assert plex_cog._fetch_art(path, None) is None
+    fake_plex.art_missing = False
+    assert plex_cog._fetch_art(path, None) is not None
+
+
+def test_play_queues_even_if_the_card_times_out(plex_cog, monkeypatch):
+    from PlexBot.exceptions import PlexTimeoutError
+
+    ctx = context(plex_cog)
+    run(plex_cog, plex_cog.play(ctx, "Track", "1"))
+    player = plex_cog._get_player(ctx, create=False)
+    run(plex_cog, asyncio.wait_for(ctx.voice.clients[0].played.wait(), 5))
+
+    def slow_card(*args, **kwargs):
+        raise PlexTimeoutError
+
+    monkeypatch.setattr(plex_cog, "_build_embed_track", slow_card)
+    with pytest.raises(PlexTimeoutError):
+        run(plex_cog, plex_cog.play(ctx, "Track", "2"))
+    assert [entry.title for entry in player.play_queue] == ["Track 2"]
+
+
+def test_timeouts_get_a_reply(plex_cog):
+    from discord.ext.commands import CommandInvokeError
+
+    from PlexBot.exceptions import PlexTimeoutError
+
+    ctx = context(plex_cog)
+    error = CommandInvokeError(PlexTimeoutError())
+    run(plex_cog, plex_cog.cog_command_error(ctx, error))
+    (_, msg), = ctx.channel.sent
+    assert msg.content == "Plex is taking too long to respond, try again later."
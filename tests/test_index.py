@@ -0,0 +1,226 @@
+"""Library index search, Plex paging and the on-disk snapshot."""
+import asyncio
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+from PlexBot.index import fetch_page
+from PlexBot.index import IndexEntry
+from PlexBot.index import IndexSnapshot
+from PlexBot.index import LibraryIndex
+from PlexBot.index import normalize
+from PlexBot.index import trigrams
+
+
+def entry(key, title, libtype="track", artist="Artist", updated_at=1):
+    return IndexEntry(key, libtype, title, "Album", artist, None, 1000, updated_at)
+
+
+def make_index():
+    index = LibraryIndex()
+    index.add(entry(1, "Bohemian Rhapsody", artist="Queen"))
+    index.add(entry(2, "Under Pressure", artist="Queen"))
+    index.add(entry(3, "Héroes", artist="David Bowie"))
+    index.add(entry(4, "A Night at the Opera", libtype="album", artist="Queen"))
+    return index
+
+
+def test_normalize():
+    assert normalize("  Héroes!  (Live) ") == "heroes live"
+    assert normalize(None) == ""
+
+
+def test_trigrams_are_padded():
+    assert trigrams("ab") == {"  a", " ab", "ab "}
+
+
+def test_exact_title():
+    assert make_index().search("bohemian rhapsody").rating_key == 1
+
+
+def test_accents_and_case_are_ignored():
+    assert make_index().search("HEROES").rating_key == 3
+
+
+def test_fuzzy_title():
+    assert make_index().search("bohemian rapsody").rating_key == 1
+    assert make_index().search("under presure queen").rating_key == 2
+
+
+def test_libtypes_are_separate():
+    index = make_index()
+    assert index.search("a night at the opera", "album").rating_key == 4
+    assert index.search("a night at the opera", "track") is None
+
+
+def test_no_match():
+    assert make_index().search("completely unrelated words") is None
+    assert make_index().search("!!!") is None
+
+
+def test_replace_and_remove():
+    index = make_index()
+    index.add(entry(1, "Killer Queen", artist="Queen"))
+    assert index.search("bohemian rhapsody") is None
+    assert index.search("killer queen").rating_key == 1
+    index.remove(1)
+    assert index.search("killer queen") is None
+    assert len(index) == 3
+
+
+class RecordingServer:
+    """Plex server stand-in recording queries, answering with elements."""
+
+    def __init__(self, elements):
+        self.elements = elements
+        self.queries = []
+
+    def query(self, key, headers=None):
+        self.queries.append((key, headers))
+        return self.elements
+
+
+def test_fetch_page_builds_the_query():
+    from xml.etree.ElementTree import Element
+
+    track = Element(
+        "Track",
+        ratingKey="7",
+        title="Song",
+        parentTitle="Album",
+        grandparentTitle="Artist",
+        parentThumb="/thumb",
+        duration="1000",
+        addedAt="5",
+        updatedAt="9",
+    )
+    server = RecordingServer([track])
+    page = fetch_page(server, "3", "track", 200, 100, **{"updatedAt>>": 42})
+
+    key, headers = server.queries[0]
+    assert key == "/library/sections/3/all?type=10&updatedAt>>=42"
+    assert headers == {"X-Plex-Container-Start": "200", "X-Plex-Container-Size": "100"}
+    assert page == [IndexEntry(7, "track", "Song", "Album", "Artist", "/thumb", 1000, 9)]
+
+
+def test_fetch_page_against_plex(fake_plex):
+    plexapi_server = pytest.importorskip("plexapi.server")
+    server = plexapi_server.PlexServer(fake_plex.url, "test")
+    added = next(iter(fake_plex.library.tracks.values()))["addedAt"]
+
+    albums = fetch_page(server, "1", "album", 0, 100)
+    assert len(albums) == len(fake_plex.library.albums)
+    assert {a.libtype for a in albums} == {"album"}
+
+    first = fetch_page(server, "1", "track", 0, 25)
+    rest = fetch_page(server, "1", "track", 25, 100)
+    assert len(first) == 25
+    assert len(first) + len(rest) == len(fake_plex.library.tracks)
+
+    assert len(fetch_page(server, "1", "track", 0, 100, **{"addedAt>>": added})) == 60
+    assert fetch_page(server, "1", "track", 0, 100, **{"updatedAt>>": added + 60}) == []
+
+
+def test_index_sync_survives_plex_errors():
+    bot = pytest.importorskip("PlexBot.bot")
+    requests = pytest.importorskip("requests")
+
+    async def run():
+        calls = []
+
+        async def sync(since):
+            calls.append(since)
+            if len(calls) == 1:
+                # Half way through, the watermark already moved
+                cog.index_watermark = 99
+                raise requests.ConnectionError("down")
+            cog.index_watermark = 50
+            if len(calls) == 3:
+                done.set()
+            return 0
+
+        done = asyncio.Event()
+        cog = SimpleNamespace(
+            snapshot=None,
+            connected=asyncio.Event(),
+            index=LibraryIndex(),
+            index_watermark=10,
+            index_refresh=0,
+            _sync_index=sync,
+        )
+        cog.connected.set()
+        task = asyncio.ensure_future(bot.Plex._index_task(cog))
+        try:
+            await asyncio.wait_for(done.wait(), 5)
+        finally:
+            task.cancel()
+        return calls
+
+    # Retried from the old watermark, the partial sync is not trusted
+    assert asyncio.run(run())[:3] == [None, None, 50]
+
+
+def test_snapshot_round_trip(tmp_path):
+    snapshot = IndexSnapshot(tmp_path / "index.sqlite")
+    index = make_index()
+    snapshot.save(index, 123)
+
+    restored = LibraryIndex()
+    assert snapshot.load(restored) == 123
+    assert len(restored) == 4
+    assert restored.search("bohemian rapsody").rating_key == 1
+    assert restored.search("a night at the opera", "album").rating_key == 4
+
+
+def test_snapshot_saves_only_changes(tmp_path):
+    snapshot = IndexSnapshot(tmp_path / "index.sqlite")
+    index = make_index()
+    snapshot.save(index, 1)
+    index.remove(2)
+    index.add(entry(5, "Radio Ga Ga", artist="Queen"))
+    assert index.drain()[:2] == ([entry(5, "Radio Ga Ga", artist="Queen")], [2])
+    index.undrain([entry(5, "Radio Ga Ga", artist="Queen")], [2], {})
+    snapshot.save(index, 2)
+
+    restored = LibraryIndex()
+    assert snapshot.load(restored) == 2
+    assert restored.get(2) is None
+    assert restored.search("radio ga ga").rating_key == 5
+    assert restored.search("under pressure") is None
+
+
+def test_failed_save_is_retried(tmp_path, monkeypatch):
+    snapshot = IndexSnapshot(tmp_path / "index.sqlite")
+    index = make_index()
+    real_connect = IndexSnapshot._connect
+
+    class FullDisk:
+        def __init__(self, conn):
+            self.conn = conn
+
+        def __enter__(self):
+            raise sqlite3.OperationalError("database or disk is full")
+
+        def __exit__(self, *exc):
+            return False
+
+        def close(self):
+            self.conn.close()
+
+    monkeypatch.setattr(IndexSnapshot, "_connect", lambda self: FullDisk(real_connect(self)))
+    with pytest.raises(sqlite3.OperationalError):
+        snapshot.save(index, 10)
+
+    monkeypatch.setattr(IndexSnapshot, "_connect", real_connect)
+    snapshot.save(index, 20)
+    restored = LibraryIndex()
+    assert snapshot.load(restored) == 20
+    assert len(restored) == 4
+    assert restored.search("under presure").rating_key == 2
+
+
+def test_missing_snapshot_loads_nothing(tmp_path):
+    index = LibraryIndex()
+    assert IndexSnapshot(tmp_path / "none" / "index.sqlite").load(index) == 0
+    assert len(index) == 0
@@ -0,0 +1,97 @@
+"""Lyrics parsing, the lyrics cache and what lookups get cached."""
+import asyncio
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+from PlexBot.lyrics import LyricsCache
+from PlexBot.lyrics import strip_lrc
+
+
+def test_strip_lrc():
+    text = "[ar:Someone]\n[00:01.00]First line\n[00:02.50][00:10.00] Second\nPlain"
+    assert strip_lrc(text) == "First line\nSecond\nPlain"
+
+
+def test_cache_round_trip_through_sqlite(tmp_path):
+    path = tmp_path / "lyrics.sqlite"
+    LyricsCache(path).put(1, "words")
+    LyricsCache(path).put(2, "")
+
+    # A fresh cache has nothing in memory, both come from disk
+    cache = LyricsCache(path)
+    assert cache.get(1) == "words"
+    assert cache.get(2) == ""
+    assert cache.get(3) is None
+
+
+def test_cache_expires(tmp_path):
+    path = tmp_path / "lyrics.sqlite"
+    cache = LyricsCache(path, ttl=60)
+    cache.put(1, "words")
+    conn = sqlite3.connect(str(path))
+    with conn:
+        conn.execute("UPDATE lyrics SET fetched_at = fetched_at - 120")
+    conn.close()
+    cache._items.clear()
+    assert cache.get(1) is None
+
+
+def test_memory_only_cache_is_bounded():
+    cache = LyricsCache()
+    for key in range(LyricsCache.MEMORY_ITEMS + 1):
+        cache.put(key, str(key))
+    assert cache.get(0) is None
+    assert cache.get(LyricsCache.MEMORY_ITEMS) == str(LyricsCache.MEMORY_ITEMS)
+
+
+class FakeGateway:
+    def __init__(self, result):
+        self.result = result
+
+    async def run(self, func, *args):
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+def find_lyrics(plex_text, genius=None, token="token"):
+    """Run Plex._find_lyrics against fake sources, return text and cache."""
+    bot = pytest.importorskip("PlexBot.bot")
+    loop = asyncio.new_event_loop()
+    cog = SimpleNamespace(
+        bot=SimpleNamespace(loop=loop),
+        lyrics_cache=LyricsCache(),
+        gateway=FakeGateway(plex_text),
+        pms=None,
+        session=None,
+        timeout=None,
+        lyrics_token=token,
+        _genius_lyrics=lambda entry: genius,
+    )
+    entry = SimpleNamespace(rating_key=1)
+    try:
+        text = loop.run_until_complete(bot.Plex._find_lyrics(cog, entry))
+    finally:
+        loop.close()
+    return text, cog.lyrics_cache.get(1)
+
+
+def test_found_lyrics_are_cached():
+    assert find_lyrics("from plex") == ("from plex", "from plex")
+    assert find_lyrics(None, genius="from genius") == ("from genius", "from genius")
+
+
+def test_miss_of_every_source_is_cached():
+    assert find_lyrics(None, genius=None) == ("", "")
+
+
+def test_miss_without_genius_token_is_not_cached():
+    assert find_lyrics(None, genius="never asked", token=None) == ("", None)
+
+
+def test_miss_with_plex_unreachable_is_not_cached():
+    requests = pytest.importorskip("requests")
+    error = requests.ConnectionError("down")
+    assert find_lyrics(error, genius=None) == ("", None)
@@ -0,0 +1,68 @@
+"""Tests of the metrics registry and its text exposition."""
+from PlexBot.metrics import Registry
+
+
+def test_counter_and_gauge_render():
+    registry = Registry()
+    calls = registry.counter("calls_total", "Calls.", ["call", "status"])
+    busy = registry.gauge("busy", "Busy.")
+    calls.inc(call="search", status="ok")
+    calls.inc(2, call="search", status="ok")
+    calls.inc(call='a"b\n', status="error")
+    busy.inc()
+    busy.inc()
+    busy.dec()
+
+    assert calls.get(call="search", status="ok") == 3
+    assert busy.get() == 1
+    text = registry.render()
+    assert "# HELP calls_total Calls.\n# TYPE calls_total counter\n" in text
+    assert 'calls_total{call="search",status="ok"} 3\n' in text
+    assert 'calls_total{call="a\\"b\\n",status="error"} 1\n' in text
+    assert "\nbusy 1\n" in text
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    seconds = registry.histogram("op_seconds", "Op latency.", ["op"])
+    seconds.observe(0.003, op="a")
+    seconds.observe(0.2, op="a")
+    seconds.observe(30, op="a")
+
+    assert seconds.summary(op="a") == (3, (0.003 + 0.2 + 30) / 3)
+    assert seconds.summary(op="missing") == (0, 0.0)
+    lines = registry.render().splitlines()
+    assert 'op_seconds_bucket{op="a",le="0.001"} 0' in lines
+    assert 'op_seconds_bucket{op="a",le="0.005"} 1' in lines
+    assert 'op_seconds_bucket{op="a",le="0.25"} 2' in lines
+    assert 'op_seconds_bucket{op="a",le="10"} 2' in lines
+    assert 'op_seconds_bucket{op="a",le="+Inf"} 3' in lines
+    assert 'op_seconds_count{op="a"} 3' in lines
+
+
+def test_timer_observes_blocks_and_functions():
+    registry = Registry()
+    seconds = registry.histogram("op_seconds", "Op latency.", ["op"])
+    with seconds.time(op="block"):
+        pass
+
+    @seconds.time(op="func")
+    def work():
+        return 42
+
+    assert work() == 42
+    assert seconds.summary(op="block")[0] == 1
+    assert seconds.summary(op="func")[0] == 1
+    assert {k["op"] for k in seconds.keys()} == {"block", "func"}
+
+
+def test_failing_collector_is_skipped():
+    registry = Registry()
+    registry.add_collector(lambda: {"cache_entries": 7})
+
+    def broken():
+        raise RuntimeError("gone")
+
+    registry.add_collector(broken)
+    text = registry.render()
+    assert "# TYPE cache_entries gauge\ncache_entries 7\n" in text
@@ -0,0 +1,143 @@
+"""Tests of the paced outbound message queue."""
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("discord")
+
+from PlexBot.outbox import MAX_CONTENT
+from PlexBot.outbox import ChannelOutbox
+from PlexBot.outbox import Outbox
+
+
+class FakeChannel:
+    """Messageable recording what is sent, optionally failing some of it."""
+
+    def __init__(self, fail=()):
+        self.id = 1
+        self.fail = set(fail)
+        self.sent = []
+
+    async def send(self, content=None, *, embed=None, file=None, delete_after=None):
+        await asyncio.sleep(0)
+        if content in self.fail:
+            raise RuntimeError("boom")
+        self.sent.append((content, embed, time.monotonic()))
+        return (content, embed)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_adjacent_text_is_merged():
+    async def main():
+        channel = FakeChannel()
+        outbox = ChannelOutbox(channel)
+        futs = [outbox.send("one"), outbox.send("two"), outbox.send("three")]
+        results = await asyncio.gather(*futs)
+        return channel, results
+
+    channel, results = run(main())
+    assert [c for c, _, _ in channel.sent] == ["one\ntwo\nthree"]
+    assert results == [("one\ntwo\nthree", None)] * 3
+
+
+def test_merge_stops_at_embeds_and_length():
+    async def main():
+        channel = FakeChannel()
+        outbox = ChannelOutbox(channel)
+        long = "x" * (MAX_CONTENT - 1)
+        futs = [
+            outbox.send("a"),
+            outbox.send(embed="card"),
+            outbox.send("b"),
+            outbox.send(long),
+        ]
+        await asyncio.gather(*futs)
+        return channel, long
+
+    channel, long = run(main())
+    assert [(c, e) for c, e, _ in channel.sent] == [
+        ("a", None),
+        (None, "card"),
+        ("b", None),
+        (long, None),
+    ]
+
+
+def test_keyed_message_supersedes_waiting_one():
+    async def main():
+        channel = FakeChannel()
+        outbox = ChannelOutbox(channel)
+        first = outbox.send("hold the worker")
+        old = outbox.send(embed="old", key="np")
+        new = outbox.send(embed="new", key="np")
+        await asyncio.gather(first, old, new)
+        return channel, old.result(), new.result()
+
+    channel, old, new = run(main())
+    assert [e for _, e, _ in channel.sent] == [None, "new"]
+    assert old == new == (None, "new")
+
+
+def test_messages_are_paced():
+    async def main():
+        channel = FakeChannel()
+        outbox = ChannelOutbox(channel, rate=2, per=0.2)
+        futs = [outbox.send(embed=i) for i in range(5)]
+        await asyncio.gather(*futs)
+        return channel
+
+    channel = run(main())
+    times = [t for _, _, t in channel.sent]
+    assert len(times) == 5
+    # No window of one period holds more than the rate
+    for i in range(2, 5):
+        assert times[i] - times[i - 2] >= 0.2 - 0.01
+
+
+def test_failure_only_fails_its_own_message():
+    async def main():
+        channel = FakeChannel(fail={None})
+        outbox = ChannelOutbox(channel)
+        bad = outbox.send(embed="bad")
+        good = outbox.send("after")
+        results = await asyncio.gather(bad, good, return_exceptions=True)
+        return channel, results, outbox
+
+    channel, results, outbox = run(main())
+    assert isinstance(results[0], RuntimeError)
+    assert results[1] == ("after", None)
+    assert [c for c, _, _ in channel.sent] == ["after"]
+    assert not outbox.pending
+
+
+def test_cancelled_waiter_is_skipped():
+    async def main():
+        channel = FakeChannel()
+        outbox = ChannelOutbox(channel)
+        first = outbox.send(embed="first")
+        dropped = outbox.send(embed="dropped")
+        dropped.cancel()
+        await first
+        await asyncio.sleep(0.01)
+        return channel
+
+    channel = run(main())
+    assert [e for _, e, _ in channel.sent] == ["first"]
+
+
+def test_outbox_keeps_one_queue_per_channel():
+    async def main():
+        outbox = Outbox()
+        a, b = FakeChannel(), FakeChannel()
+        b.id = 2
+        await asyncio.gather(outbox.send(a, "to a"), outbox.send(b, "to b"))
+        return outbox, a, b
+
+    outbox, a, b = run(main())
+    assert [c for c, _, _ in a.sent] == ["to a"]
+    assert [c for c, _, _ in b.sent] == ["to b"]
+    assert outbox.stats() == {"channels": 2, "pending": 0}
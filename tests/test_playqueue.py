@@ -0,0 +1,151 @@
+"""PlayQueue operations and shuffled listings filling in."""
+import asyncio
+import random
+
+import pytest
+
+from PlexBot.playqueue import PlayQueue
+from PlexBot.playqueue import ShuffleSpan
+
+
+def make_queue(items):
+    queue = PlayQueue()
+    queue.extend(items)
+    return queue
+
+
+def page(start, size=10):
+    return [f"p{num}" for num in range(start, start + size)]
+
+
+def assert_contiguous(queue, members):
+    positions = [pos for pos, entry in enumerate(queue) if entry in members]
+    assert positions == list(range(positions[0], positions[0] + len(positions)))
+
+
+def test_skip_pops_a_few():
+    queue = make_queue(range(10))
+    assert queue.skip(3) == 3
+    assert list(queue) == list(range(3, 10))
+
+
+def test_skip_copies_the_rest_past_half():
+    queue = make_queue(range(10))
+    assert queue.skip(8) == 8
+    assert list(queue) == [8, 9]
+    assert queue.skip(5) == 2
+    assert queue.empty()
+
+
+def test_skip_ignores_negative_counts():
+    queue = make_queue(range(3))
+    assert queue.skip(-1) == 0
+    assert list(queue) == [0, 1, 2]
+
+
+def test_remove():
+    queue = make_queue("abcd")
+    assert queue.remove(1) == "b"
+    assert queue.remove(-1) == "d"
+    assert list(queue) == ["a", "c"]
+
+
+def test_remove_out_of_range():
+    queue = make_queue("ab")
+    with pytest.raises(IndexError):
+        queue.remove(5)
+    assert list(queue) == ["a", "b"]
+
+
+def test_move():
+    queue = make_queue("abcd")
+    assert queue.move(0, 2) == "a"
+    assert list(queue) == ["b", "c", "a", "d"]
+    assert queue.move(3, 0) == "d"
+    assert list(queue) == ["d", "b", "c", "a"]
+
+
+def test_clear_keeps_waiters_waiting():
+    async def run():
+        queue = make_queue("ab")
+        queue.clear()
+        assert queue.empty()
+        getter = asyncio.ensure_future(queue.get())
+        await asyncio.sleep(0)
+        assert not getter.done()
+        queue.put_nowait("c")
+        assert await asyncio.wait_for(getter, 1) == "c"
+
+    asyncio.run(run())
+
+
+def test_span_keeps_queued_tracks_around_it():
+    queue = make_queue(["a", "b", "c"])
+    span = ShuffleSpan(queue)
+    for entry in page(0):
+        span.insert(entry)
+    queue.put_nowait("later")
+    for entry in page(10):
+        span.insert(entry)
+
+    items = list(queue)
+    assert items[:3] == ["a", "b", "c"]
+    assert items[-1] == "later"
+    assert sorted(items[3:-1]) == sorted(page(0) + page(10))
+
+
+def test_span_follows_remove_and_move_during_fill():
+    for seed in range(200):
+        rng = random.Random(seed)
+        random.seed(seed)
+        queue = make_queue(["a", "b", "c", "d"])
+        span = ShuffleSpan(queue)
+        members = set()
+        for num in range(5):
+            entries = page(num * 10)
+            members.update(entries)
+            for entry in entries:
+                span.insert(entry)
+            queue.put_nowait(f"later{num}")
+            # User edits between pages: remove anything, take the head
+            queue.remove(rng.randrange(len(queue)))
+            if rng.random() < 0.5:
+                members.discard(queue.get_nowait())
+            members.intersection_update(queue)
+
+        items = list(queue)
+        assert_contiguous(queue, members)
+        last = max(pos for pos, entry in enumerate(items) if entry in members)
+        later = items[last + 1 :]
+        assert all(entry.startswith("later") for entry in later)
+        before = items[: items.index(next(e for e in items if e in members))]
+        assert not any(entry.startswith("later") for entry in before)
+
+
+def test_span_after_moving_an_entry_behind_it():
+    queue = make_queue(["a", "b"])
+    span = ShuffleSpan(queue)
+    for entry in page(0):
+        span.insert(entry)
+    queue.move(0, len(queue) - 1)
+    for entry in page(10):
+        span.insert(entry)
+
+    items = list(queue)
+    assert items[0] == "b"
+    assert items[-1] == "a"
+
+
+def test_span_follows_skip():
+    queue = make_queue(["a", "b", "c"])
+    span = ShuffleSpan(queue)
+    for entry in page(0):
+        span.insert(entry)
+    queue.put_nowait("later")
+    queue.skip(5)
+    for entry in page(10):
+        span.insert(entry)
+
+    items = list(queue)
+    assert items[-1] == "later"
+    assert len(items) == 3 + 10 + 10 + 1 - 5
@@ -0,0 +1,58 @@
+"""Background connection task of the Plex cog."""
+import asyncio
+from types import SimpleNamespace
+from xml.etree.ElementTree import ParseError
+
+import pytest
+
+bot = pytest.importorskip("PlexBot.bot")
+
+
+class FlakyGateway:
+    """Raises the given errors in turn, then answers."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def run(self, func, *args):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return func(*args)
+
+
+def run_plex_task(gateway):
+    async def run():
+        cog = SimpleNamespace(
+            RECONNECT_MIN=0,
+            RECONNECT_MAX=0,
+            HEALTH_INTERVAL=60,
+            pms=None,
+            gateway=gateway,
+            _connect=lambda: None,
+            available=False,
+            connected=asyncio.Event(),
+            library_name="Music",
+        )
+        task = asyncio.ensure_future(bot.Plex._plex_task(cog))
+        try:
+            await asyncio.wait_for(cog.connected.wait(), 5)
+        finally:
+            task.cancel()
+        return cog
+
+    return asyncio.run(run())
+
+
+def test_retries_after_unexpected_errors():
+    gateway = FlakyGateway(ParseError("proxy page"), ValueError("odd"))
+    cog = run_plex_task(gateway)
+    assert cog.available
+    assert gateway.calls == 3
+
+
+def test_retries_after_connection_errors():
+    requests = pytest.importorskip("requests")
+    gateway = FlakyGateway(requests.ConnectionError("down"))
+    assert run_plex_task(gateway).available
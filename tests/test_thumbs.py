@@ -0,0 +1,80 @@
+"""Memory and disk tiers of the thumbnail cache."""
+import os
+from pathlib import Path
+
+from PlexBot.thumbs import ThumbnailCache
+
+
+def fetcher(data):
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return data
+
+    fetch.calls = calls
+    return fetch
+
+
+def test_memory_hit_skips_fetch():
+    cache = ThumbnailCache(max_bytes=1000)
+    fetch = fetcher(b"x" * 10)
+    assert cache.get("/thumb", 1, fetch) == b"x" * 10
+    assert cache.get("/thumb", 1, fetch) == b"x" * 10
+    assert len(fetch.calls) == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_new_updated_at_refetches():
+    cache = ThumbnailCache(max_bytes=1000)
+    cache.get("/thumb", 1, fetcher(b"old"))
+    assert cache.get("/thumb", 2, fetcher(b"new")) == b"new"
+
+
+def test_memory_lru_stays_in_budget():
+    cache = ThumbnailCache(max_bytes=25)
+    for num in range(5):
+        cache.get(f"/thumb/{num}", 1, fetcher(bytes(10)))
+    assert cache.stats()["evictions"] == 3
+    fetch = fetcher(bytes(10))
+    cache.get("/thumb/4", 1, fetch)
+    assert not fetch.calls
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    ThumbnailCache(0, tmp_path, 1000).get("/thumb", 1, fetcher(b"art"))
+    fetch = fetcher(b"other")
+    assert ThumbnailCache(0, tmp_path, 1000).get("/thumb", 1, fetch) == b"art"
+    assert not fetch.calls
+
+
+def test_disk_eviction_drops_oldest(tmp_path):
+    cache = ThumbnailCache(0, tmp_path, 35)
+    for num in range(3):
+        cache.get(f"/thumb/{num}", 1, fetcher(bytes(10)))
+        # Distinct mtimes, oldest first
+        for art in tmp_path.glob("*/*"):
+            stamp = art.stat().st_mtime
+            os.utime(art, (stamp - 10, stamp - 10))
+    cache.get("/thumb/3", 1, fetcher(bytes(10)))
+    remaining = sorted(art.name for art in tmp_path.glob("*/*"))
+    assert ThumbnailCache.digest("/thumb/0", 1) not in remaining
+    assert ThumbnailCache.digest("/thumb/3", 1) in remaining
+
+
+def test_disk_eviction_skips_vanished_files(tmp_path, monkeypatch):
+    cache = ThumbnailCache(0, tmp_path, 25)
+    cache.get("/thumb/0", 1, fetcher(bytes(10)))
+    cache.get("/thumb/1", 1, fetcher(bytes(10)))
+
+    # A file removed between listing and stat, as by a concurrent eviction
+    real_stat = Path.stat
+    gone = cache._disk_path(ThumbnailCache.digest("/thumb/0", 1))
+
+    def stat(self, *args, **kwargs):
+        if self == gone:
+            raise FileNotFoundError(str(self))
+        return real_stat(self, *args, **kwargs)
+
+    monkeypatch.setattr(Path, "stat", stat)
+    assert cache.get("/thumb/2", 1, fetcher(bytes(10))) == bytes(10)
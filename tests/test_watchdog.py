@@ -0,0 +1,62 @@
+"""Tests of the event loop lag watchdog."""
+import asyncio
+import time
+
+from PlexBot import metrics
+from PlexBot.watchdog import LoopWatchdog
+
+
+def watch(blocker, threshold=0.1):
+    """Run blocker as a task under a watchdog and return the stalls reported."""
+    stalls = []
+
+    async def main():
+        loop = asyncio.get_event_loop()
+        dog = LoopWatchdog(
+            loop,
+            interval=0.02,
+            threshold=threshold,
+            on_stall=lambda lag, command: stalls.append((lag, command)),
+        )
+        dog.start()
+        await asyncio.sleep(0.05)
+        await loop.create_task(blocker())
+        await asyncio.sleep(0.1)
+        dog.stop()
+        return dog
+
+    return asyncio.run(main()), stalls
+
+
+def test_stall_is_blamed_on_the_command():
+    async def blocker():
+        metrics.ACTIVE_COMMANDS[asyncio.current_task()] = "lyrics"
+        time.sleep(0.4)
+
+    before = metrics.LOOP_STALLS.get(command="lyrics")
+    dog, stalls = watch(blocker)
+    assert len(stalls) == 1
+    lag, command = stalls[0]
+    assert command == "lyrics"
+    assert lag >= 0.25
+    assert dog.stalls == 1
+    assert dog.max_lag == lag
+    assert metrics.LOOP_STALLS.get(command="lyrics") == before + 1
+
+
+def test_stall_outside_commands_names_the_coroutine():
+    async def blocker():
+        time.sleep(0.4)
+
+    _, stalls = watch(blocker)
+    assert len(stalls) == 1
+    assert "blocker" in stalls[0][1]
+
+
+def test_lag_below_threshold_is_not_a_stall():
+    async def blocker():
+        time.sleep(0.05)
+
+    dog, stalls = watch(blocker, threshold=0.3)
+    assert stalls == []
+    assert dog.stalls == 0